@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.getcwd())
+
+import time
+
+from stl_consistency.parser import STLParser
+from stl_consistency.tableau import make_tableau, default_tableau_opts
+
+from paper_benchmarks import run_with_timeout
+
+from tabulate import tabulate
+
+# Benchmark measuring how the time taken by the tableau grows with the time horizon T of long G requirements,
+# with and without skipping repetitions of time-normalized states (see stutter_jump in the tableau)
+
+formulas = {
+    'G F': "G[0,{T}] F[0,5] a",
+    'G -> G, G F': "G[0,{T}] (a -> G[1,3] !a) && G[0,{T}] F[0,4] a",
+    'G F, G F': "G[0,{T}] (F[0,3] a && F[0,3] !a) && G[0,{T}] (a -> G[1,2] b)",
+    'G U, G -> F': "G[0,{T}] (a U[1,4] b) && G[0,{T}] (b -> F[1,3] !b)",
+    'G F, G -> G, late G': "G[0,{T}] F[0,4] a && G[0,{T}] (a -> G[1,3] !a) && G[{T3},{T}] !a",
+}
+
+def run_formula(formula, max_depth, stutter_jump):
+    start_t = time.perf_counter()
+    res = make_tableau(STLParser().parse_formula_as_node(formula), max_depth, 'sat', False, False, False, False, mltl=True,
+                       tableau_opts=default_tableau_opts | {'stutter_jump': stutter_jump})
+    return res, time.perf_counter() - start_t
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(1000000000)
+    max_depth = 10000000
+    timeout = 60 # in seconds
+    horizons = [100, 1000, 10000]
+
+    results = []
+    for name, formula in formulas.items():
+        for stutter_jump in [False, True]:
+            row = [name, stutter_jump]
+            for horizon in horizons:
+                res = run_with_timeout(timeout, run_formula, formula.format(T=horizon, T3=horizon - 3), max_depth, stutter_jump)
+                row.append('timeout' if res == 'timeout' else res[1])
+            results.append(row)
+    header = ['Formula', 'Stutter jump'] + [f'T = {horizon} (s)' for horizon in horizons]
+    print(tabulate(results, headers=header, floatfmt='.3f'))
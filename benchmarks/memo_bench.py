@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.getcwd())
+
+import time
+import random
+
+from stl_consistency.parser import STLParser, normalize_bounds
+from stl_consistency.node import Node
+from stl_consistency.memo import ListRejectedStore, TrieRejectedStore
+import stl_consistency.tableau as tableau
+
+from paper_benchmarks import datasets, make_and
+
+from tabulate import tabulate
+
+# Benchmark comparing the sorted list formerly used as the store of rejected tableau nodes with the trie index.
+# Nodes added to and looked up in the store are either recorded while running the tableau on the paper benchmarks,
+# or randomly generated, and then replayed on stores of increasing size.
+
+class RecordingStore(TrieRejectedStore):
+
+    added = []
+    queried = []
+
+    def add(self, node):
+        RecordingStore.added.append(node)
+        super().add(node)
+
+    def find_implied(self, node):
+        RecordingStore.queried.append(node.shallow_copy(list(node.operands)))
+        return super().find_implied(node)
+
+def record_nodes(max_depth):
+    tableau.TrieRejectedStore = RecordingStore
+    try:
+        for name, data in datasets.items():
+            formula = normalize_bounds(STLParser().parse_relational_exprs(make_and(data)), 1)
+            print('Recording', name, '...')
+            tableau.make_tableau(Node(*formula), max_depth, 'sat', False, False, False, False)
+    finally:
+        tableau.TrieRejectedStore = TrieRejectedStore
+    return RecordingStore.added, RecordingStore.queried
+
+def random_node(num_props, num_operands, horizon):
+    operands = []
+    for _ in range(num_operands):
+        prop = ['p' + str(random.randrange(num_props))]
+        lower = random.randrange(horizon)
+        upper = lower + random.randrange(horizon)
+        match random.randrange(4):
+            case 0:
+                operands.append(prop)
+            case 1:
+                operands.append(['!', prop])
+            case 2:
+                operands.append(['G', str(lower), str(upper), prop])
+            case 3:
+                operands.append(['F', str(lower), str(upper), prop])
+    # At least one temporal operator, as in the nodes stored by the tableau
+    operands.append(['G', '0', str(horizon), ['p0']])
+    node = Node(',', *operands)
+    node.current_time = 0
+    node.sort_operands()
+    return node
+
+def generate_nodes(num_nodes, num_queries, num_props, num_operands, horizon):
+    added = [random_node(num_props, num_operands, horizon) for _ in range(num_nodes)]
+    # Half of the queries extend a stored node, so that they may imply it
+    queried = []
+    for _ in range(num_queries):
+        node = random_node(num_props, num_operands, horizon)
+        if random.randrange(2):
+            node = node.shallow_copy(node.operands + random.choice(added).operands)
+            node.sort_operands()
+        queried.append(node)
+    return added, queried
+
+def replay(store_class, added, queries):
+    store = store_class()
+    start_t = time.perf_counter()
+    for node in added:
+        store.add(node)
+    add_t = time.perf_counter()
+    hits = sum(store.find_implied(node) is not None for node in queries)
+    query_t = time.perf_counter()
+    return (add_t - start_t) / len(added), (query_t - add_t) / len(queries), hits
+
+def compare_stores(added, queries):
+    results = []
+    size = 10
+    while True:
+        size = min(size, len(added))
+        list_res = replay(ListRejectedStore, added[:size], queries)
+        trie_res = replay(TrieRejectedStore, added[:size], queries)
+        results.append([size, list_res[0] * 1e6, trie_res[0] * 1e6, list_res[1] * 1e6, trie_res[1] * 1e6, list_res[2], trie_res[2]])
+        if size == len(added):
+            break
+        size *= 4
+
+    header = ['Store size', 'List insert (us)', 'Trie insert (us)', 'List lookup (us)', 'Trie lookup (us)', 'List hits', 'Trie hits']
+    print(tabulate(results, headers=header))
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(1000000000)
+    max_depth = 10000000
+    num_queries = 2000
+    random.seed(0)
+
+    added, queried = record_nodes(max_depth)
+    print(f'Recorded {len(added)} rejected nodes and {len(queried)} lookups')
+    compare_stores(added, random.sample(queried, min(num_queries, len(queried))))
+
+    print('Random nodes')
+    added, queried = generate_nodes(10240, num_queries // 4, num_props=50, num_operands=8, horizon=20)
+    compare_stores(added, queried)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.getcwd())
+
+import time
+import random
+
+from stl_consistency.parser import STLParser
+from stl_consistency.node import Node
+import stl_consistency.memo as memo
+import stl_consistency.tableau as tableau
+
+from paper_benchmarks import run_with_timeout
+
+from tabulate import tabulate
+
+# Benchmark measuring how often rejected tableau nodes are reused by memoization on random MLTL formulas
+# full of Until and Release operators, with the current implication rules (see Node.implies_quick_inner)
+# and with the legacy ones, which only related F and G operators with equal operands.
+
+class CountingStore(memo.TrieRejectedStore):
+
+    instance = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingStore.instance = self
+
+def random_formula(rng, depth, props):
+    if depth == 0 or rng.random() < 0.2:
+        prop = rng.choice(props)
+        return prop if rng.random() < 0.7 else '!' + prop
+    op = rng.choice(['G', 'F', 'U', 'R', 'U', 'R', '&&', '||'])
+    if op in {'&&', '||'}:
+        return f'({random_formula(rng, depth - 1, props)}) {op} ({random_formula(rng, depth - 1, props)})'
+    lower = rng.randint(0, 10)
+    upper = lower + rng.randint(1, 20)
+    if op in {'G', 'F'}:
+        return f'{op}[{lower},{upper}] ({random_formula(rng, depth - 1, props)})'
+    return f'({random_formula(rng, depth - 1, props)}) {op}[{lower},{upper}] ({random_formula(rng, depth - 1, props)})'
+
+def make_corpus(num_formulas, seed=0):
+    rng = random.Random(seed)
+    props = ['a', 'b', 'c', 'd']
+    return [' && '.join(random_formula(rng, 3, props) for _ in range(rng.randint(2, 5))) for _ in range(num_formulas)]
+
+def run_formula(formula, max_depth, mode, legacy_rules):
+    '''
+    Runs the tableau in the current process, which is a subprocess created by run_with_timeout
+    :return: the result, the elapsed time, and the number of lookups and hits in the rejected store
+    '''
+    tableau.TrieRejectedStore = CountingStore
+    if legacy_rules:
+        memo.weaker_signatures = lambda sig: [sig]
+        bounds_imply = Node.bounds_imply
+        Node.bounds_imply = lambda operator, *bounds: operator in {'F', 'G', 'P', '!'} and bounds_imply(operator, *bounds)
+    start_t = time.perf_counter()
+    res = tableau.make_tableau(STLParser().parse_formula_as_node(formula), max_depth, mode, False, False, False, False, mltl=True)
+    return res, time.perf_counter() - start_t, CountingStore.instance.lookups, CountingStore.instance.hits
+
+def measure(corpus, max_depth, mode, legacy_rules, timeout):
+    solved = elapsed = lookups = hits = 0
+    for formula in corpus:
+        res = run_with_timeout(timeout, run_formula, formula, max_depth, mode, legacy_rules)
+        if res == 'timeout':
+            elapsed += timeout
+        else:
+            solved += 1
+            elapsed += res[1]
+            lookups += res[2]
+            hits += res[3]
+    hit_rate = 100 * hits / lookups if lookups else 0
+    return ['F, G only' if legacy_rules else 'all', mode, solved, lookups, hits, hit_rate, elapsed]
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(1000000000)
+    max_depth = 10000000
+    timeout = 10 # in seconds
+    corpus = make_corpus(100)
+
+    results = [
+        measure(corpus, max_depth, mode, legacy_rules, timeout)
+        for mode in ['sat', 'strong_sat']
+        for legacy_rules in [True, False]
+    ]
+    header = ['Rules', 'Mode', 'Solved', 'Lookups', 'Hits', 'Hit rate (%)', 'Time (s)']
+    print(f'{len(corpus)} random MLTL formulas, timeout {timeout} s')
+    print(tabulate(results, headers=header, floatfmt='.2f'))
@@ -0,0 +1,73 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import pickle
+
+class Checkpoint:
+    '''
+    The part of a tableau search that is still to be explored, which can be saved to a file
+    and resumed later by resume_tableau, possibly with a larger depth limit.
+    The frontier contains the nodes whose subtrees have not been explored yet: those that reached the depth limit,
+    and the unexplored children of the nodes in the current branch, if the search was interrupted.
+    Nodes in the subtrees of simple nodes are left out, as accepting branches of simple nodes are ignored anyway.
+    So the formula is satisfiable if and only if some node in the frontier is, unless accepted is True.
+    '''
+
+    format_version = 2
+
+    def __init__(self, mode, tableau_opts, number_of_implications, frontier, rejected, traces=False, accepted=False, memo_max_entries=None, memo_eviction='lru', expanded_nodes=0):
+        '''
+        :param frontier: list of triples (node, depth, trace), where trace is the linked trace of the branch
+                         up to node (see TableauData.trace), or None if traces are not computed.
+                         Entries share the segments of their common prefixes, so each of them is saved only once.
+        :param rejected: rejected nodes in the memoization store (see TrieRejectedStore.export_entries)
+        :param traces: True if traces are computed
+        :param accepted: True if an accepting branch has already been found ('complete' mode only)
+        :param expanded_nodes: number of tableau nodes expanded before saving the checkpoint
+        '''
+        self.version = Checkpoint.format_version
+        self.mode = mode
+        self.tableau_opts = tableau_opts
+        self.number_of_implications = number_of_implications
+        self.frontier = frontier
+        self.rejected = rejected
+        self.traces = traces
+        self.accepted = accepted
+        self.memo_max_entries = memo_max_entries
+        self.memo_eviction = memo_eviction
+        self.expanded_nodes = expanded_nodes
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # If the process is killed while writing, the previous checkpoint is still valid
+        os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if not isinstance(checkpoint, Checkpoint) or checkpoint.version != Checkpoint.format_version:
+        raise ValueError(f'{path} is not a valid tableau checkpoint')
+    return checkpoint
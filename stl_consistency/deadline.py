@@ -0,0 +1,66 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+
+class Deadline:
+    '''
+    Wall-clock deadline and cancellation token for the consistency checking engines.
+    The tableau polls expired() in its search loop, and the SMT-based checker turns the remaining time into a z3 timeout.
+    When the deadline expires, or cancel() is called (e.g., from another thread), engines give up and return None,
+    after storing partial statistics of the search in statistics.
+    Deadlines can be passed to other processes, as they use the system-wide monotonic clock,
+    but cancel() only affects the process in which it is called.
+    '''
+
+    def __init__(self, timeout=None):
+        '''
+        :param timeout: time budget in seconds, starting now, or None for no time limit
+        '''
+        self.end = None if timeout is None else time.monotonic() + timeout
+        self.cancelled = False
+        self.callbacks = [] # called by cancel(), e.g. to interrupt a running solver
+        self.statistics = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['callbacks'] = []
+        return state
+
+    def cancel(self):
+        self.cancelled = True
+        for callback in list(self.callbacks):
+            callback()
+
+    def expired(self):
+        return self.cancelled or (self.end is not None and time.monotonic() >= self.end)
+
+    def remaining(self):
+        '''
+        :return: the number of seconds left (0 if the deadline has expired), or None if there is no time limit
+        '''
+        if self.cancelled:
+            return 0
+        if self.end is None:
+            return None
+        return max(self.end - time.monotonic(), 0)
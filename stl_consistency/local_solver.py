@@ -29,6 +29,7 @@ class LocalSolver:
         self.solver = z3.Solver()
         self.z3_variables = {}
         self.z3_ast_cache = {} # contains entries of the form (negated, key) -> z3_ast
+        self.constraint_nodes = {} # contains entries of the form (is_real, key) -> P node of the constraint
         self.boolean_solver = BooleanSolver()
         self.current_assertions = set() # contains entries of the form (negated, key) keeping track of current assertions in solver
         self.assertion_stack = [] # contains entries of the form [(negated, key)]
@@ -39,18 +40,18 @@ class LocalSolver:
         new_solver = LocalSolver()
         new_solver.z3_variables = self.z3_variables
         new_solver.z3_ast_cache = self.z3_ast_cache
+        new_solver.constraint_nodes = self.constraint_nodes
         return new_solver
 
-    def add_boolean_constraint(self, negated, prop):
-        # TODO use identifier
-        entry = (negated, prop)
-        if entry not in self.current_assertions:
-            self.current_assertions.add(entry)
-            self.assertion_stack[-1].append(entry)
-            self.boolean_solver.add_constraint(negated, prop)
-
-            if self.check_result:
-                self.check_result = self.boolean_solver.check()
+    def add_boolean_constraint(self, negated, node):
+        '''
+        :param node: a P node containing a Boolean variable, with the identifier assigned by assign_identifier
+        '''
+        assert node.identifier is not None
+        self.constraint_nodes.setdefault((False, node.identifier), node)
+        self.boolean_solver.add_constraint(negated, node.identifier)
+        if not self.boolean_solver.check():
+            self.check_result = False
 
     def add_real_constraint(self, negated, node):
         assert node.identifier is not None
@@ -61,6 +62,7 @@ class LocalSolver:
             if entry not in self.z3_ast_cache:
                     z3_ast = self.real_term_to_z3(node)
                     self.z3_ast_cache[entry] = z3.Not(z3_ast) if negated else z3_ast
+                    self.constraint_nodes.setdefault((True, node.identifier), node)
             self.solver.assert_exprs(self.z3_ast_cache[entry])
             
             if (not negated, node.identifier) in self.current_assertions:
@@ -75,8 +77,32 @@ class LocalSolver:
             self.check_result = self.boolean_solver.check() and self.solver.check() == z3.sat
         return self.check_result
 
+    def unsat_core(self):
+        '''
+        To be called after check() returned False.
+        For Boolean constraints, the core is a pair of clashing literals.
+        For real constraints, it is computed by z3 from assumption literals tracking the current assertions.
+        :return: an unsatisfiable subset of the current constraints, as a list of pairs (negated, P node),
+                 or None if z3 cannot compute it
+        '''
+        clash = self.boolean_solver.clash()
+        if clash is not None:
+            node = self.constraint_nodes[(False, clash)]
+            return [(False, node), (True, node)]
+        assumptions = {} # z3 id of assumption literal -> (literal, entry of current_assertions)
+        core_solver = z3.Solver()
+        for entry in self.current_assertions:
+            literal = z3.Bool(f'core!{len(assumptions)}')
+            assumptions[literal.get_id()] = (literal, entry)
+            core_solver.add(z3.Implies(literal, self.z3_ast_cache[entry]))
+        if core_solver.check(*(literal for literal, _ in assumptions.values())) != z3.unsat:
+            return None
+        core = [assumptions[literal.get_id()][1] for literal in core_solver.unsat_core()]
+        return [(negated, self.constraint_nodes[(True, key)]) for negated, key in core]
+
     def push(self):
         self.assertion_stack.append([])
+        self.boolean_solver.push()
         self.solver.push()
 
     def pop(self):
@@ -84,17 +110,16 @@ class LocalSolver:
             old_assertions = self.assertion_stack.pop()
             for ass in old_assertions:
                 self.current_assertions.remove(ass)
-                negated, term = ass
-                if isinstance(term, str):
-                    self.boolean_solver.remove_constraint(negated, term)
             self.solver.pop()
-            if len(old_assertions) > 0:
+            # Removing constraints cannot make a satisfiable set of constraints unsatisfiable
+            if (self.boolean_solver.pop() or len(old_assertions) > 0) and not self.check_result:
                 self.check_result = None
 
     def reset(self):
         self.assertion_stack = []
         self.current_assertions = set()
         self.check_result = None
+        self.boolean_solver = BooleanSolver()
         self.solver.reset()
 
     def real_term_to_z3(self, node):
@@ -142,34 +167,40 @@ class LocalSolver:
 
 
 class BooleanSolver:
+    '''
+    Boolean variables are represented by their identifiers (see assign_identifier),
+    and the sets of positive and negative literals by bitmasks indexed by such identifiers.
+    '''
 
     def __init__(self):
-        self.pos_props = set()
-        self.neg_props = set()
-        self.check_result = True
+        self.pos_mask = 0
+        self.neg_mask = 0
+        self.mask_stack = [] # contains the pair (pos_mask, neg_mask) at each push
 
-    def add_constraint(self, negated, prop):
+    def add_constraint(self, negated, prop_id):
         if negated:
-            self.neg_props.add(prop)
-            if prop in self.pos_props:
-                self.check_result = False
+            self.neg_mask |= 1 << prop_id
         else:
-            self.pos_props.add(prop)
-            if prop in self.neg_props:
-                self.check_result = False
+            self.pos_mask |= 1 << prop_id
 
-    def remove_constraint(self, negated, prop):
-        if negated:
-            self.neg_props.remove(prop)
-        else:
-            self.pos_props.remove(prop)
+    def push(self):
+        self.mask_stack.append((self.pos_mask, self.neg_mask))
 
-        if not self.check_result:
-            # It we remove a constraint, the set of terms might become satisfiable
-            self.check_result = None
-    
-    def check(self):
-        if self.check_result is None:
-            self.check_result = self.pos_props.isdisjoint(self.neg_props)
+    def pop(self):
+        '''
+        :return: True if some constraint has been removed
+        '''
+        pos_mask, neg_mask = self.mask_stack.pop()
+        changed = pos_mask != self.pos_mask or neg_mask != self.neg_mask
+        self.pos_mask, self.neg_mask = pos_mask, neg_mask
+        return changed
 
-        return self.check_result
+    def check(self):
+        return self.pos_mask & self.neg_mask == 0
+
+    def clash(self):
+        '''
+        :return: the identifier of a variable occurring both in a positive and in a negative literal, or None
+        '''
+        clashing = self.pos_mask & self.neg_mask
+        return (clashing & -clashing).bit_length() - 1 if clashing else None
@@ -0,0 +1,551 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import ast
+import bisect
+import heapq
+import itertools
+import json
+import sqlite3
+from stl_consistency.node import Node
+from stl_consistency.parser import STLParser
+
+def signature_arguments(node):
+    '''
+    :return: the formulas identifying node in its signature (see operand_signature)
+    '''
+    return [node] if node.operator == 'P' else node.operands
+
+def operand_signature(node):
+    '''
+    :return: a key identifying the operator and the operands of node, but not its time bounds.
+             An operand can imply (see Node.implies_quick_inner) only operands with the same signature
+             or with one of its weaker signatures (see weaker_signatures).
+    '''
+    return (node.operator, tuple(op.get_formula_id() for op in signature_arguments(node)))
+
+def canonical_signature(node):
+    '''
+    :return: a string identifying the operator and the operands of node, which is the same in all runs
+    '''
+    if node.operator == 'P':
+        return repr(('P', Node.lists_to_tuples(node.operands)))
+    return repr((node.operator, tuple(Node.lists_to_tuples(op.to_list()) for op in node.operands)))
+
+def atoms(node):
+    '''
+    :return: the set of canonical strings of the atomic propositions in node
+    '''
+    if node.operator == 'P':
+        return {repr(Node.lists_to_tuples(node.operands))}
+    return set().union(*(atoms(op) for op in node.operands))
+
+def expression_variables(expr):
+    '''
+    :param expr: an operand of a relational constraint, as parsed by STLParser
+    :return: the set of real variables occurring in expr
+    '''
+    if isinstance(expr, str):
+        return set() if STLParser.is_float(expr) else {expr}
+    return set().union(*(expression_variables(e) for e in expr[1:]))
+
+formula_symbols = {} # formula id -> symbols of the formula
+
+def symbols(node):
+    '''
+    :return: the set of Boolean and real variables occurring in node
+             (including the constants true and false, which are treated as Boolean variables)
+    '''
+    formula_id = node.get_formula_id()
+    result = formula_symbols.get(formula_id)
+    if result is None:
+        if node.operator == 'P':
+            if len(node.operands) == 1:
+                result = {node[0]}
+            else:
+                result = set().union(*(expression_variables(expr) for expr in node.operands[1:]))
+        else:
+            result = set().union(*(symbols(op) for op in node.operands))
+        result = formula_symbols[formula_id] = frozenset(result)
+    return result
+
+def implication_ids(node):
+    '''
+    :return: the set of identifiers of the implications in node (see count_implications)
+    '''
+    if node.operator == '->':
+        return {node.identifier} if node.identifier is not None else set()
+    if node.operator == 'P':
+        return set()
+    return set().union(*(implication_ids(op) for op in node.operands))
+
+# Signatures are interned to dense ids, so that stored nodes are tuples of integers
+signature_ids = {} # operand_signature -> signature id
+canonical_signature_ids = {} # canonical_signature -> signature id
+signature_operators = [] # operator of each signature id
+signature_canonical = [] # canonical_signature of each signature id
+signature_keys = [] # operand_signature of each signature id
+signature_atoms = [] # atoms of each signature id
+signature_symbols = [] # symbols of each signature id
+signature_weaker = [] # weaker_signatures of each signature id, with the number of signatures when they were computed
+
+# Conjunctions and disjunctions occurring in the signatures, to find weaker signatures
+boolean_formulas = {} # formula id -> (operator, formula ids of the operands)
+containing_formulas = {} # (operator, formula id) -> ids of the formulas with that operator having it as an operand
+
+def clear_tables():
+    '''
+    Clears the tables above, which are indexed by formula ids (see Node.get_formula_id),
+    so that they do not grow across tableau runs in the same process
+    '''
+    formula_symbols.clear()
+    signature_ids.clear()
+    canonical_signature_ids.clear()
+    for table in (signature_operators, signature_canonical, signature_keys, signature_atoms, signature_symbols, signature_weaker):
+        table.clear()
+    boolean_formulas.clear()
+    containing_formulas.clear()
+
+def register_boolean_formula(node):
+    if node.operator in {'&&', '||'}:
+        formula_id = node.get_formula_id()
+        if formula_id not in boolean_formulas:
+            operands = frozenset(op.get_formula_id() for op in node.operands)
+            boolean_formulas[formula_id] = (node.operator, operands)
+            for op_id in operands:
+                containing_formulas.setdefault((node.operator, op_id), set()).add(formula_id)
+            for op in node.operands:
+                register_boolean_formula(op)
+
+def intern_signature(canonical, operator, arguments=None):
+    '''
+    :param arguments: see signature_arguments, parsed from canonical if None
+    '''
+    sig = canonical_signature_ids.get(canonical)
+    if sig is None:
+        if arguments is None:
+            operator, operands = ast.literal_eval(canonical)
+            arguments = [Node(*operands)] if operator == 'P' else [Node(*op) for op in operands]
+        sig = canonical_signature_ids[canonical] = len(signature_operators)
+        key = (operator, tuple(arg.get_formula_id() for arg in arguments))
+        signature_ids[key] = sig
+        signature_operators.append(operator)
+        signature_canonical.append(canonical)
+        signature_keys.append(key)
+        signature_atoms.append(set().union(*(atoms(arg) for arg in arguments)))
+        signature_symbols.append(frozenset().union(*(symbols(arg) for arg in arguments)))
+        signature_weaker.append(None)
+        for arg in arguments:
+            register_boolean_formula(arg)
+    return sig
+
+def weaker_formulas(formula_id):
+    '''
+    :return: the ids of the formulas occurring in signatures that are implied by the formula with the given id,
+             according to Node.boolean_implies
+    '''
+    operator, operands = boolean_formulas.get(formula_id, (None, None))
+    premises = operands if operator == '&&' else {formula_id}
+    weaker = {formula_id} | premises
+    for premise in premises:
+        weaker.update(f for f in containing_formulas.get(('&&', premise), ()) if boolean_formulas[f][1] <= premises)
+    for implied in list(weaker):
+        weaker.update(containing_formulas.get(('||', implied), ()))
+    if operator == '||':
+        weaker.update(f for f in containing_formulas.get(('||', next(iter(operands))), ()) if operands <= boolean_formulas[f][1])
+    return weaker
+
+def weaker_signatures(sig):
+    '''
+    :return: the ids of the signatures of temporal operators whose operands are implied by those of sig
+             (see Node.implies_quick_inner), including sig itself
+    '''
+    weaker = signature_weaker[sig]
+    if weaker is None or weaker[0] != len(signature_operators):
+        operator, arguments = signature_keys[sig]
+        if operator in {'G', 'F', 'U', 'R'}:
+            keys = ((operator, args) for args in itertools.product(*map(weaker_formulas, arguments)))
+            weaker = signature_weaker[sig] = (len(signature_operators), [signature_ids[key] for key in keys if key in signature_ids])
+        else:
+            weaker = signature_weaker[sig] = (len(signature_operators), [sig])
+    return weaker[1]
+
+def compact_operand(node, time):
+    '''
+    :return: a tuple (signature id, lower bound, upper bound) representing node,
+             with bounds relative to time (0 for non-temporal operators)
+    '''
+    key = operand_signature(node)
+    sig = signature_ids.get(key)
+    if sig is None:
+        sig = intern_signature(canonical_signature(node), node.operator, signature_arguments(node))
+    if node.operator in {'G', 'F', 'U', 'R'}:
+        return (sig, node.lower - time, node.upper - time)
+    return (sig, 0, 0)
+
+def portable_operand(operand):
+    '''
+    :return: compact operand (see compact_operand) with the signature id replaced by the canonical signature and operator,
+             which do not depend on the current process
+    '''
+    sig, lower, upper = operand
+    return (signature_canonical[sig], signature_operators[sig], lower, upper)
+
+def interned_operand(operand):
+    '''
+    Inverse of portable_operand
+    '''
+    canonical, operator, lower, upper = operand
+    return (intern_signature(canonical, operator), lower, upper)
+
+def is_implied(query, shifts, operands, required=(), implications=frozenset()):
+    '''
+    Same as Node.implies_quick, for a node in compact form.
+    :param query: dict mapping each signature id of the implying node to the bounds of its operands with that signature
+    :param shifts: time instants to which the bounds of the implying node can be related (its lower bounds)
+    :param operands: compact operands (see compact_operand) of the implied node, relative to its current time
+    :param required: pairs (compact operand, implication ids) of the implying node that must occur, with the same bounds, in implications
+    :param implications: pairs (compact operand, implication ids) of the operands of the implied node that contain implications
+    '''
+    for shift in shifts:
+        for sig, lower, upper in operands:
+            operator = signature_operators[sig]
+            if not any(Node.bounds_imply(operator, q_lower - shift, q_upper - shift, lower, upper) for q_lower, q_upper in query[sig]):
+                break
+        else:
+            if all(((sig, lower - shift, upper - shift) if signature_operators[sig] in {'G', 'F', 'U', 'R'} else (sig, lower, upper), ids) in implications
+                   for (sig, lower, upper), ids in required):
+                return True
+    return False
+
+
+class ListRejectedStore:
+    '''
+    Rejected nodes in a list sorted by Node.get_imply_sort_key.
+    Insertions take linear time, and lookups scan the suffix of the list that may contain nodes implied by the query.
+    '''
+
+    def __init__(self):
+        self.nodes = []
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        bisect.insort_left(self.nodes, node, key=Node.get_imply_sort_key)
+
+    def find_implied(self, node):
+        '''
+        :param node: a node with sorted operands (see Node.sort_operands)
+        :return: a stored node implied by node, or None if we cannot find one
+        '''
+        max_lower = max((op.lower for op in node.operands if op.operator in {'G', 'F', 'U', 'R'}))
+        i = bisect.bisect_left(self.nodes, node.get_imply_sort_key(max_lower), key=Node.get_imply_sort_key)
+        for rejected in self.nodes[i:]:
+            if node.implies_quick(rejected):
+                return rejected
+            if node.operands[-1].get_imply_search_key() < rejected.operands[0].get_imply_search_key():
+                return None
+        return None
+
+
+class TrieNode:
+    __slots__ = ('parent', 'signature', 'children', 'entries')
+
+    def __init__(self, parent, signature):
+        self.parent = parent
+        self.signature = signature
+        self.children = {} # signature id -> TrieNode
+        self.entries = [] # stored nodes whose set of operand signatures is the path from the root
+
+
+class MemoEntry:
+    '''
+    A rejected node in compact form, with the statistics used by eviction policies
+    '''
+    __slots__ = ('operands', 'leaf', 'hits', 'last_hit', 'version', 'persistent', 'satisfied', 'implications')
+
+    def __init__(self, operands, leaf, time, persistent=False, satisfied=None, implications=frozenset()):
+        self.operands = operands # sorted tuple of compact operands (see compact_operand)
+        # For strong_sat: the implications satisfied by the node, None if the node is unsatisfiable
+        self.satisfied = satisfied
+        self.implications = implications # pairs (compact operand, implication ids) of the operands containing implications
+        self.leaf = leaf # TrieNode containing the entry, None if it has been evicted
+        self.hits = 0
+        self.last_hit = time
+        self.version = 0 # incremented when the priority of the entry changes
+        self.persistent = persistent # True if the entry is already in the LemmaCache
+
+    def symbols(self):
+        '''
+        :return: the set of variables occurring in the operands of the entry (see symbols)
+        '''
+        return frozenset().union(*(signature_symbols[sig] for sig, _, _ in self.operands))
+
+
+eviction_policies = {
+    'lru': lambda entry: entry.last_hit,
+    'lfu': lambda entry: (entry.hits, entry.last_hit),
+    'most-specific': lambda entry: -len(entry.operands),
+}
+
+class TrieRejectedStore:
+    '''
+    Rejected nodes indexed by a trie on the sorted sets of the signatures of their operands (see operand_signature).
+    A node can only imply stored nodes whose signatures are a subset of its own and of their weaker signatures,
+    so lookups only visit the paths of the trie made of those signatures of the query,
+    and check the time bounds only for the nodes stored along them.
+    Nodes are stored in compact form as tuples of integers (see compact_operand).
+    If max_entries is given, when the store is full an entry is evicted before adding a new one, according to the eviction policy:
+    'lru' evicts the entry that was least recently used to reject a node,
+    'lfu' the entry that rejected the fewest nodes,
+    and 'most-specific' the entry with the most operands, which is the least likely to be implied by other nodes.
+    In strong_sat mode (track_implications), a rejected node may be satisfiable, but not satisfying all implications.
+    Then it only rejects nodes that satisfied a subset of its implications,
+    and whose operands with implications still to be satisfied also occur in it, with the same bounds.
+    '''
+
+    def __init__(self, max_entries=None, eviction='lru', track_implications=False):
+        if eviction not in eviction_policies:
+            raise ValueError(f'Unknown eviction policy: {eviction}')
+        if max_entries is not None and max_entries < 1:
+            raise ValueError('The rejected store must be able to contain at least one entry')
+        self.root = TrieNode(None, None)
+        self.size = 0
+        self.max_entries = max_entries
+        self.priority = eviction_policies[eviction]
+        self.eviction = eviction
+        self.track_implications = track_implications
+        self.eviction_queue = [] # heap of (priority, version, seq, entry), with stale items for old versions
+        self.seq = 0
+        # Statistics
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, node):
+        operands = [compact_operand(op, node.current_time) for op in node.operands]
+        if self.track_implications:
+            implications = frozenset((compact, frozenset(ids)) for compact, ids in zip(operands, map(implication_ids, node.operands)) if ids)
+            self.add_compact(tuple(sorted(operands)), satisfied=frozenset(node.satisfied_implications), implications=implications)
+        else:
+            self.add_compact(tuple(sorted(operands)))
+
+    def add_compact(self, operands, persistent=False, satisfied=None, implications=frozenset()):
+        '''
+        :param operands: sorted tuple of compact operands (see compact_operand)
+        :param persistent: True if the entry comes from a LemmaCache
+        :param satisfied, implications: see MemoEntry
+        '''
+        if self.max_entries is not None and self.size >= self.max_entries:
+            # We make room before adding the new entry, which would otherwise be the first to be evicted by 'lfu'
+            self.evict()
+        trie_node = self.root
+        for sig in sorted({op[0] for op in operands}):
+            child = trie_node.children.get(sig)
+            if child is None:
+                child = trie_node.children[sig] = TrieNode(trie_node, sig)
+            trie_node = child
+        entry = MemoEntry(operands, trie_node, self.lookups, persistent, satisfied, implications)
+        trie_node.entries.append(entry)
+        self.size += 1
+        if self.max_entries is not None:
+            self.enqueue(entry)
+
+    def entries(self):
+        stack = [self.root]
+        while stack:
+            trie_node = stack.pop()
+            yield from trie_node.entries
+            stack.extend(trie_node.children.values())
+
+    def export_entries(self):
+        '''
+        :return: a list of the entries of the store that can be saved and imported in another process (see import_entries)
+        '''
+        return [(
+            [portable_operand(op) for op in entry.operands],
+            entry.satisfied,
+            [(portable_operand(op), ids) for op, ids in entry.implications]
+        ) for entry in self.entries()]
+
+    def import_entries(self, entries):
+        for operands, satisfied, implications in entries:
+            self.add_compact(
+                tuple(sorted(map(interned_operand, operands))),
+                satisfied=satisfied,
+                implications=frozenset((interned_operand(op), ids) for op, ids in implications)
+            )
+
+    def find_implied(self, node):
+        '''
+        :return: a stored entry implied by node, or None if we cannot find one
+        '''
+        self.lookups += 1
+        query = {}
+        pending = [] # (compact operand, implication ids) for the operands of node with implications not satisfied yet
+        for op in node.operands:
+            compact = compact_operand(op, 0)
+            for sig in weaker_signatures(compact[0]):
+                query.setdefault(sig, []).append(compact[1:])
+            if self.track_implications:
+                ids = implication_ids(op)
+                if not ids <= node.satisfied_implications:
+                    pending.append((compact, frozenset(ids)))
+        shifts = sorted({op.lower for op in node.operands if op.operator in {'G', 'F', 'U', 'R'}})
+        signatures = sorted(query)
+        positions = {sig: i for i, sig in enumerate(signatures)}
+        stack = [(self.root, 0)] # trie nodes to visit, with the position of the first signature that may follow
+        while stack:
+            trie_node, start = stack.pop()
+            for entry in trie_node.entries:
+                if entry.satisfied is None:
+                    required = ()
+                elif node.satisfied_implications <= entry.satisfied:
+                    required = [(compact, ids) for compact, ids in pending if not ids - node.satisfied_implications <= entry.satisfied]
+                else:
+                    continue
+                if is_implied(query, shifts, entry.operands, required, entry.implications):
+                    self.hit(entry)
+                    return entry
+            children = trie_node.children
+            if len(children) < len(signatures) - start:
+                for sig, child in children.items():
+                    i = positions.get(sig, -1)
+                    if i >= start:
+                        stack.append((child, i + 1))
+            else:
+                for i in range(start, len(signatures)):
+                    child = children.get(signatures[i])
+                    if child is not None:
+                        stack.append((child, i + 1))
+        return None
+
+    def hit(self, entry):
+        self.hits += 1
+        entry.hits += 1
+        entry.last_hit = self.lookups
+        if self.max_entries is not None and self.eviction != 'most-specific':
+            entry.version += 1
+            self.enqueue(entry)
+
+    def enqueue(self, entry):
+        if len(self.eviction_queue) > 2 * self.size + 16:
+            # Drop stale items
+            self.eviction_queue = [item for item in self.eviction_queue if item[3].leaf is not None and item[1] == item[3].version]
+            heapq.heapify(self.eviction_queue)
+        self.seq += 1
+        heapq.heappush(self.eviction_queue, (self.priority(entry), entry.version, self.seq, entry))
+
+    def evict(self):
+        while True:
+            _, version, _, entry = heapq.heappop(self.eviction_queue)
+            if entry.leaf is not None and version == entry.version:
+                break
+        trie_node = entry.leaf
+        trie_node.entries.remove(entry)
+        entry.leaf = None
+        while trie_node is not self.root and not trie_node.entries and not trie_node.children:
+            del trie_node.parent.children[trie_node.signature]
+            trie_node = trie_node.parent
+        self.size -= 1
+        self.evictions += 1
+
+
+class LemmaCache:
+    '''
+    SQLite database of rejected tableau nodes, which can be shared by different runs of the tableau
+    (e.g., on successive versions of a requirement set).
+    Rejected nodes are unsatisfiable formulas, so they can be reused for any formula with the same semantics
+    (STL or MLTL) and with any tableau options.
+    When loading, we only take those containing atomic propositions that occur in the formula to be checked,
+    as the others can never be implied by its tableau nodes.
+    '''
+
+    def __init__(self, path, mltl):
+        self.connection = sqlite3.connect(path)
+        self.semantics = 'mltl' if mltl else 'stl'
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS lemmas (
+                    id INTEGER PRIMARY KEY,
+                    semantics TEXT NOT NULL,
+                    operands TEXT NOT NULL,
+                    UNIQUE (semantics, operands)
+                )''')
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS lemma_atoms (
+                    lemma INTEGER NOT NULL REFERENCES lemmas(id),
+                    atom TEXT NOT NULL
+                )''')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS lemma_atoms_lemma ON lemma_atoms(lemma)')
+
+    def load(self, store, formula):
+        '''
+        Adds to store the cached rejected nodes whose atomic propositions all occur in formula
+        :return: the number of loaded nodes
+        '''
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS formula_atoms (atom TEXT PRIMARY KEY)')
+        self.connection.execute('DELETE FROM formula_atoms')
+        self.connection.executemany('INSERT INTO formula_atoms VALUES (?)', ((atom,) for atom in atoms(formula)))
+        rows = self.connection.execute('''
+            SELECT operands FROM lemmas
+            WHERE semantics = ? AND NOT EXISTS (
+                SELECT 1 FROM lemma_atoms
+                WHERE lemma = lemmas.id AND atom NOT IN (SELECT atom FROM formula_atoms)
+            )''', (self.semantics,))
+        loaded = 0
+        for (operands,) in rows:
+            operands = tuple(sorted(
+                (intern_signature(canonical, operator), lower, upper)
+                for canonical, operator, lower, upper in json.loads(operands)
+            ))
+            store.add_compact(operands, persistent=True)
+            loaded += 1
+        return loaded
+
+    def save(self, store):
+        '''
+        Adds to the cache the rejected nodes in store that are not in it yet
+        :return: the number of saved nodes
+        '''
+        saved = 0
+        with self.connection:
+            for entry in store.entries():
+                if entry.persistent or entry.satisfied is not None:
+                    # Nodes rejected in strong_sat mode depend on the implications of the formula
+                    continue
+                operands = json.dumps(sorted([signature_canonical[sig], signature_operators[sig], lower, upper] for sig, lower, upper in entry.operands))
+                cursor = self.connection.execute('INSERT OR IGNORE INTO lemmas (semantics, operands) VALUES (?, ?)', (self.semantics, operands))
+                if cursor.rowcount == 1:
+                    entry_atoms = set().union(*(signature_atoms[sig] for sig, _, _ in entry.operands))
+                    self.connection.executemany('INSERT INTO lemma_atoms VALUES (?, ?)', ((cursor.lastrowid, atom) for atom in entry_atoms))
+                    saved += 1
+                entry.persistent = True
+        return saved
+
+    def close(self):
+        self.connection.close()
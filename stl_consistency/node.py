@@ -21,6 +21,11 @@
 # SOFTWARE.
 
 class Node:
+    # Unique table for hash-consing: maps the structure of every formula seen so far,
+    # i.e., (operator, lower, upper, ids of the operands), to a small integer id,
+    # so that structurally equal formulas get the same id
+    unique_table = {}
+
     def __init__(self, *args):
         if len(args) == 0:
             return # We create an empty object to be filled later
@@ -38,6 +43,8 @@ class Node:
         self.or_element = -1 # identifies univoc operands of || inside a G
         self.jump1 = False # needed because in some instances you can only jump 1 step to make sure you do not miss anything important
         self.siblings_imply = False
+        self.formula_id = None # cached id from the unique table, see get_formula_id
+        self.shared_operands = False # True if self.operands may be shared with other nodes, see own_operands
         if operator in {'&&', '||', ',', '!', 'O', '->', '<->'}:
             self.lower = self.upper = -1
             self.operands = list(args)
@@ -87,10 +94,29 @@ class Node:
         Replaces the operand at the given index with the new operand(s),
         appending operands other than the first to the end.
         '''
-        self.operands[index] = new_operand
-        self.operands.extend(more_new_operands)
+        operands = self.own_operands()
+        operands[index] = new_operand
+        operands.extend(more_new_operands)
+
+    def remove_operand(self, index):
+        del self.own_operands()[index]
+
+    def own_operands(self):
+        '''
+        Operand lists are shared copy-on-write between a node and its shallow copies:
+        this method must be called before modifying self.operands in place.
+        :return: self.operands, copied first if it may be shared with other nodes
+        '''
+        if self.shared_operands:
+            self.operands = self.operands.copy()
+            self.shared_operands = False
+        self.formula_id = None
+        return self.operands
 
-    def shallow_copy(self):
+    def shallow_copy(self, operands=None):
+        '''
+        :param operands: the operand list of the copy; if None, the copy shares the operands of self
+        '''
         new = Node()
         new.current_time = self.current_time
         new.initial_time = self.initial_time
@@ -102,11 +128,18 @@ class Node:
         new.or_element = self.or_element
         new.jump1 = self.jump1
         new.siblings_imply = False
+        new.formula_id = None
         new.lower = self.lower
         new.upper = self.upper
-        new.operands = self.operands.copy()
+        if operands is None:
+            new.operands = self.operands
+            new.shared_operands = self.shared_operands = True
+        else:
+            new.operands = operands
+            new.shared_operands = False
         if hasattr(self, 'satisfied_implications'):
-            new.satisfied_implications = self.satisfied_implications.copy()
+            # Never modified in place, so it can be shared
+            new.satisfied_implications = self.satisfied_implications
         return new
 
     def set_initial_time(self):
@@ -173,11 +206,13 @@ class Node:
         return self.operands[i]
 
     def flatten(self):
+        self.formula_id = None
         if self.operator in {'&&', '||', ','}:
-            for i in range(len(self.operands)):
-                self.operands[i].flatten()
-                if self.operands[i].operator == self.operator:
-                    self.operands[i:i+1] = self.operands[i].operands
+            operands = self.own_operands()
+            for i in range(len(operands)):
+                operands[i].flatten()
+                if operands[i].operator == self.operator:
+                    operands[i:i+1] = operands[i].operands
         if self.operator != 'P':
             for op in self.operands:
                 op.flatten()
@@ -215,20 +250,46 @@ class Node:
         else:
             raise ValueError('Bad operator')
 
+    def get_formula_id(self):
+        '''
+        :return: the id of the formula in the unique table, which is the same for structurally equal formulas
+        The id is cached, so formula content must not be modified after calling this method
+        (methods such as replace_operand take care of resetting it).
+        '''
+        if self.formula_id is None:
+            if self.operator == 'P':
+                key = ('P', Node.lists_to_tuples(self.operands))
+            else:
+                key = (self.operator, self.lower, self.upper, tuple(op.get_formula_id() for op in self.operands))
+            self.formula_id = Node.unique_table.setdefault(key, len(Node.unique_table))
+        return self.formula_id
+
+    def reset_formula_ids(self):
+        '''
+        Forgets the ids of self and its subformulas cached by get_formula_id, which must be done if Node.unique_table is cleared
+        '''
+        self.formula_id = None
+        for op in self.operands:
+            if isinstance(op, Node):
+                op.reset_formula_ids()
+
+    def __getstate__(self):
+        # Ids are only valid w.r.t. the unique table of the current process
+        state = self.__dict__.copy()
+        state['formula_id'] = None
+        return state
+
     def __hash__(self):
         '''
         Node: only hashes formula content!
         '''
-        return hash((
-            self.operator, self.lower, self.upper,
-            Node.lists_to_tuples(self.operands) if self.operator == 'P' else tuple(self.operands)
-        ))
+        return self.get_formula_id()
 
     def __eq__(self, other):
         '''
         Note: only checks formula equality!
         '''
-        return isinstance(other, Node) and (self.operator, self.lower, self.upper, self.operands) == (other.operator, other.lower, other.upper, other.operands)
+        return isinstance(other, Node) and self.get_formula_id() == other.get_formula_id()
 
     def __lt__(self, other):
         # TODO do something less ugly
@@ -295,21 +356,69 @@ class Node:
         )
 
     def sort_operands(self):
-        self.operands.sort(key=lambda op: op.get_imply_sort_key(self.current_time))
+        self.own_operands().sort(key=lambda op: op.get_imply_sort_key(self.current_time))
+
+    def bounds_imply(operator, lower_self, upper_self, lower_other, upper_other):
+        '''
+        :return: True if a formula with the given operator and bounds implies the formula
+                 with the same operator, operands implied by its own (see boolean_implies), and bounds lower_other and upper_other
+        '''
+        match operator:
+            case 'F':
+                return lower_other <= lower_self and upper_other >= upper_self
+            case 'G':
+                return lower_self <= lower_other and upper_self >= upper_other
+            case 'U':
+                # The first operand must hold from the lower bound until the second one holds
+                return lower_self == lower_other and upper_self <= upper_other
+            case 'R':
+                return lower_self == lower_other and upper_self >= upper_other
+            case 'P' | '!':
+                return True
+        return False
+
+    def boolean_implies(self, other):
+        '''
+        :return: True if we can quickly determine that self implies other, because they are equal,
+                 other is a conjunction of conjuncts of self (or one of them),
+                 or other is a disjunction containing self, one of those, or all disjuncts of self.
+        Only for operands of temporal operators: nested bounds are compared as they are
+        '''
+        if self == other:
+            return True
+        premises = self.operands if self.operator == '&&' else [self]
+        if other in premises or (other.operator == '&&' and all(op in premises for op in other.operands)):
+            return True
+        if other.operator == '||':
+            return (
+                self in other.operands
+                or any(op in premises or (op.operator == '&&' and all(c in premises for c in op.operands)) for op in other.operands)
+                or (self.operator == '||' and all(op in other.operands for op in self.operands))
+            )
+        return False
 
     def implies_quick_inner(self, other, time_self, time_other):
         if self.operator != other.operator:
             return False
         match self.operator:
-            case 'F':
-                return other.lower - time_other <= self.lower - time_self and other.upper - time_other >= self.upper - time_self and self.operands[0] == other.operands[0]
-            case 'G':
-                return self.lower - time_self <= other.lower - time_other and self.upper - time_self >= other.upper - time_other and self.operands[0] == other.operands[0]
+            case 'F' | 'G' | 'U' | 'R':
+                return (
+                    Node.bounds_imply(self.operator, self.lower - time_self, self.upper - time_self, other.lower - time_other, other.upper - time_other)
+                    and all(op_self.boolean_implies(op_other) for op_self, op_other in zip(self.operands, other.operands))
+                )
             case 'P':
-                return self.operands[0] == other.operands[0]
+                return self == other
             case '!':
                 return self.operands[0].implies_quick_inner(other.operands[0], time_self, time_other)
-            # TODO: U, R, etc
+            case '&&' | '||':
+                # Nested temporal operators have absolute bounds, so they are only comparable at the same time
+                return (time_self == time_other or not self.check_boolean_closure(lambda n: n.operator in {'G', 'F', 'U', 'R'})) and self.boolean_implies(other)
+            case 'O':
+                # Bounds of derived operators are shifted differently by jumps
+                return (
+                    self.operands[0].is_derived() == other.operands[0].is_derived()
+                    and self.operands[0].implies_quick_inner(other.operands[0], time_self, time_other)
+                )
         return False
 
     def implies_quick(self, other):
@@ -0,0 +1,220 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import multiprocessing as mp
+import os
+import pickle
+import queue
+from stl_consistency.local_solver import LocalSolver
+
+class WorkPool:
+    '''
+    State shared by the worker processes of the parallel tableau.
+    Each worker explores a subtree of the tableau depth-first with its own stack.
+    When some worker is idle, busy workers donate to it the next unexplored child
+    of the frame closest to the root of their subtree (see add_children),
+    so the size of donated subtrees adapts to the available work.
+    Rejected nodes found by each worker are sent in batches to all other workers,
+    which add them to their own rejected_store (see exchange_rejected).
+    '''
+
+    sync_interval = 16 # number of calls to exchange_rejected between two actual exchanges
+    batch_size = 8 # number of rejected nodes after which they are sent to other workers
+
+    def __init__(self, num_workers):
+        self.tasks = mp.Queue() # contains entries of the form (node, depth), or None to stop workers
+        self.inboxes = [mp.Queue() for _ in range(num_workers)] # batches of pickled rejected nodes for each worker
+        self.lock = mp.Lock() # protects all the following counters
+        self.idle = mp.RawValue('i', 0) # number of workers waiting for a task
+        self.queued = mp.RawValue('i', 0) # number of tasks donated but not taken by a worker yet
+        self.pending = mp.RawValue('i', 0) # number of tasks donated but not completed yet
+        self.donations = mp.RawValue('q', 0) # number of tasks donated, including the root
+        self.found = mp.RawValue('b', False) # True if some task found an accepting branch
+        self.max_depth_reached = mp.RawValue('b', False)
+        self.failed = mp.RawValue('b', False) # True if some worker raised an exception
+        self.expanded_nodes = mp.RawValue('q', 0)
+        self.done = mp.Event() # set when the result of the search is known
+        self.cancelled = mp.RawValue('b', False) # cancellation token, polled by workers in their search loop
+        # The following fields are local to each worker process
+        self.worker_id = None
+        self.outbox = [] # rejected nodes not yet sent to other workers
+        self.sync_countdown = WorkPool.sync_interval
+
+    def is_cancelled(self):
+        # Read without locking, as it is checked very often and never reset
+        return self.cancelled.value
+
+    def cancel(self, num_workers):
+        '''
+        Stops all workers: busy ones stop at the next iteration of their search loop, idle ones get a None task
+        '''
+        self.cancelled.value = True
+        for _ in range(num_workers):
+            self.tasks.put(None)
+
+    def wants_work(self):
+        '''
+        :return: True if some idle worker is not going to take a task already donated
+        '''
+        # Read without locking: at worst, we donate slightly too early or too late
+        return self.idle.value > self.queued.value
+
+    def donate(self, node, depth):
+        with self.lock:
+            self.pending.value += 1
+            self.queued.value += 1
+            self.donations.value += 1
+        self.tasks.put((node, depth))
+
+    def get_task(self):
+        '''
+        Waits for a donated task.
+        :return: a pair (node, depth), or None if the worker must stop
+        '''
+        with self.lock:
+            self.idle.value += 1
+        task = self.tasks.get()
+        if task is not None:
+            with self.lock:
+                self.idle.value -= 1
+                self.queued.value -= 1
+        return task
+
+    def task_done(self, res, expanded_nodes):
+        with self.lock:
+            self.expanded_nodes.value += expanded_nodes
+            if res:
+                self.found.value = True
+            elif res is None:
+                self.max_depth_reached.value = True
+            self.pending.value -= 1
+            if res or self.pending.value == 0:
+                self.done.set()
+
+    def publish_rejected(self, node):
+        self.outbox.append(node)
+        if len(self.outbox) >= WorkPool.batch_size:
+            self.flush_rejected()
+
+    def flush_rejected(self):
+        if self.outbox:
+            data = pickle.dumps(self.outbox)
+            for i, inbox in enumerate(self.inboxes):
+                if i != self.worker_id:
+                    inbox.put(data)
+            self.outbox = []
+
+    def exchange_rejected(self):
+        '''
+        Every sync_interval calls, sends pending rejected nodes to other workers and receives theirs.
+        :return: the list of rejected nodes received from other workers
+        '''
+        self.sync_countdown -= 1
+        if self.sync_countdown > 0:
+            return []
+        self.sync_countdown = WorkPool.sync_interval
+        self.flush_rejected()
+        received = []
+        inbox = self.inboxes[self.worker_id]
+        while True:
+            try:
+                received.extend(pickle.loads(inbox.get_nowait()))
+            except queue.Empty:
+                return received
+
+    def fail(self):
+        with self.lock:
+            self.failed.value = True
+        self.done.set()
+
+
+def worker(worker_id, explore, tableau_data, max_depth, work_pool):
+    work_pool.worker_id = worker_id
+    while True:
+        task = work_pool.get_task()
+        if task is None or work_pool.is_cancelled():
+            return
+        node, depth = task
+        expanded_nodes = tableau_data.expanded_nodes
+        try:
+            res = explore(tableau_data, LocalSolver(), node, depth, max_depth, work_pool)
+        except:
+            work_pool.fail()
+            raise
+        if work_pool.is_cancelled():
+            return
+        work_pool.flush_rejected()
+        work_pool.task_done(res, tableau_data.expanded_nodes - expanded_nodes)
+
+
+# Time in seconds we wait for workers to stop after cancellation before terminating them
+# (they may be stuck in a long call to the SMT solver)
+STOP_TIMEOUT = 1
+
+# Time in seconds between two checks of the deadline of the search (see Deadline) while waiting for the workers
+DEADLINE_POLL_INTERVAL = 0.05
+
+def parallel_search(explore, tableau_data, root, max_depth, num_workers):
+    '''
+    Explores the tableau rooted at root with a fixed pool of worker processes that share work.
+    Only for modes 'sat' and 'strong_sat', in which an accepting branch found by any worker
+    determines the result.
+    :param explore: function exploring a subtree depth-first, donating work to the pool (i.e., add_children)
+    :param num_workers: number of worker processes, or None for one per core
+    :return: the result for the tableau rooted at root (see build_decomposition_tree)
+    '''
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    work_pool = WorkPool(num_workers)
+    workers = [
+        mp.Process(target=worker, args=(i, explore, tableau_data, max_depth, work_pool), daemon=True)
+        for i in range(num_workers)
+    ]
+    for p in workers:
+        p.start()
+    deadline = tableau_data.deadline
+    try:
+        work_pool.donate(root, 0)
+        if deadline is None:
+            work_pool.done.wait()
+        else:
+            # Workers also poll the deadline, but they cannot see its cancellation
+            while not work_pool.done.wait(DEADLINE_POLL_INTERVAL) and not deadline.expired():
+                pass
+    finally:
+        work_pool.cancel(num_workers)
+        for p in workers:
+            p.join(STOP_TIMEOUT)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+
+    if work_pool.failed.value:
+        raise RuntimeError('A worker of the parallel tableau failed')
+    tableau_data.expanded_nodes = work_pool.expanded_nodes.value
+    if tableau_data.verbose:
+        print(f'Donated {work_pool.donations.value - 1} tasks between {num_workers} workers')
+    if work_pool.found.value:
+        return True
+    if not work_pool.done.is_set() or work_pool.max_depth_reached.value:
+        return None
+    return False
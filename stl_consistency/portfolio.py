@@ -0,0 +1,169 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import multiprocessing as mp
+import os
+import traceback
+from multiprocessing.connection import wait
+from stl_consistency.node import Node
+from stl_consistency.smtchecker import smt_check_consistency
+from stl_consistency.tableau import make_tableau, default_tableau_opts
+from stl_consistency.deadline import Deadline
+
+def run_engine(engine, args, connection):
+    try:
+        connection.send((engine(*args), None))
+    except:
+        connection.send((None, traceback.format_exc()))
+
+def race(engines):
+    '''
+    Runs the given engines in separate processes and returns the first definitive result.
+    All other engines are terminated as soon as such a result is known.
+    Engines whose process dies without giving a result (e.g., killed for running out of memory) count as failed.
+    :param engines: list of (name, function, args) tuples, where function(*args) returns True, False or None
+    :return: a pair (result, name), where name is the engine that gave the result.
+             If no engine gives a definitive result, result is None and name is None.
+    '''
+    connections = []
+    processes = []
+    for _, engine, args in engines:
+        receiver, sender = mp.Pipe(duplex=False)
+        connections.append((receiver, sender))
+        processes.append(mp.Process(target=run_engine, args=(engine, args, sender)))
+    for p in processes:
+        p.start()
+    for _, sender in connections:
+        # Only the engine process keeps the sending end, so the receiving end sees its exit
+        sender.close()
+    try:
+        errors = []
+        pending = set(range(len(engines)))
+        while pending:
+            wait([connections[i][0] for i in pending] + [processes[i].sentinel for i in pending])
+            for i in sorted(pending):
+                receiver = connections[i][0]
+                try:
+                    if receiver.poll():
+                        res, error = receiver.recv()
+                    elif not processes[i].is_alive():
+                        raise EOFError
+                    else:
+                        continue
+                except EOFError:
+                    processes[i].join()
+                    res, error = None, f'process exited with code {processes[i].exitcode} without giving a result'
+                pending.remove(i)
+                if error is not None:
+                    errors.append(f'{engines[i][0]}:\n{error}')
+                elif res is not None:
+                    return res, engines[i][0]
+        if len(errors) == len(engines):
+            raise RuntimeError('All engines of the portfolio failed:\n' + '\n'.join(errors))
+        return None, None
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        for receiver, _ in connections:
+            receiver.close()
+
+
+def check_with_tableau(formula, max_depth, mode, mltl, tableau_opts, deadline=None):
+    node = Node(*formula)
+    node.flatten()
+    return make_tableau(node, max_depth, mode, False, False, False, False, mltl, tableau_opts, deadline=deadline)
+
+def check_with_smt(formula, mode, deadline=None):
+    return smt_check_consistency(formula, mode, False, deadline=deadline)
+
+def portfolio_check(formula, max_depth, mode, mltl=False, tableau_opts=default_tableau_opts, verbose=False, timeout=None):
+    '''
+    Checks the consistency of formula by racing the tableau against the SMT-based checker,
+    each in its own process. The first engine giving a definitive answer wins, and the other one is killed.
+    The SMT-based checker does not support MLTL semantics, so only the tableau is run if mltl is True.
+    :param formula: the formula in list form (see STLParser.parse_formula_as_stl_list)
+    :param max_depth: maximum depth of the tableau
+    :param timeout: time limit in seconds after which all engines give up, or None
+    :return: True if formula is consistent, False if it is not, None if no engine could tell
+    '''
+    deadline = Deadline(timeout) if timeout is not None else None
+    engines = [('tableau', check_with_tableau, (formula, max_depth, mode, mltl, tableau_opts, deadline))]
+    if not mltl:
+        engines.append(('smt', check_with_smt, (formula, mode, deadline)))
+    res, winner = race(engines)
+    if verbose:
+        print(f'Portfolio result given by: {winner}')
+    return res
+
+
+# Built-in tableau configurations, sorted by decreasing priority.
+# Each one disables some of the options in default_tableau_opts.
+builtin_tableau_configurations = [
+    {},
+    {'children_order_opts': False},
+    {'simple_nodes_first': False},
+    {'memoization': False},
+    {'early_local_consistency_check': False},
+    {'g_f': False},
+    {'formula_opts': False},
+    {'children_order_opts': False, 'simple_nodes_first': False},
+]
+
+def configuration_name(tableau_opts):
+    disabled = [opt for opt, value in tableau_opts.items() if not value]
+    return 'tableau (' + (', '.join(f'no {opt}' for opt in disabled) if disabled else 'default') + ')'
+
+def tableau_portfolio_check(formula, max_depth, mode, mltl=False, configurations=None, num_configurations=None, verbose=False, timeout=None):
+    '''
+    Checks the consistency of formula by running the tableau with several configurations of tableau_opts,
+    each in its own process, and returns the first definitive answer.
+    :param formula: the formula in list form (see STLParser.parse_formula_as_stl_list)
+    :param configurations: list of dicts of tableau options, each overriding default_tableau_opts,
+                           or None to use builtin_tableau_configurations
+    :param num_configurations: number of configurations to run (the first ones in the list),
+                               or None to run one per core if configurations is None, and all of them otherwise
+    :param timeout: time limit in seconds after which all configurations give up, or None
+    :return: True if formula is consistent, False if it is not, None if no configuration could tell
+    '''
+    if configurations is None:
+        configurations = builtin_tableau_configurations
+        if num_configurations is None:
+            num_configurations = os.cpu_count()
+    if num_configurations is not None:
+        configurations = configurations[:max(num_configurations, 1)]
+    for config in configurations:
+        for opt in config:
+            if opt not in default_tableau_opts:
+                raise ValueError(f'Unknown tableau option: {opt}')
+
+    deadline = Deadline(timeout) if timeout is not None else None
+    engines = []
+    for config in configurations:
+        tableau_opts = default_tableau_opts | config
+        engines.append((configuration_name(tableau_opts), check_with_tableau, (formula, max_depth, mode, mltl, tableau_opts, deadline)))
+    res, winner = race(engines)
+    if verbose:
+        print(f'Portfolio result given by: {winner}')
+    return res
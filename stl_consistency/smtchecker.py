@@ -69,6 +69,12 @@ class SMTSTLConsistencyChecker:
                         print(f"{prop} = Bool('{prop}')")
                     self.smt_variables[prop] = Bool(prop)
 
+    def _deadline_expired(self, deadline):
+        if deadline is not None and deadline.expired():
+            deadline.statistics['smt_variables'] = len(self.smt_variables)
+            return True
+        return False
+
     def _encode_real_expr(self, expr, encoded_time):
         if isinstance(expr, str):
             if STLParser.is_float(expr):
@@ -99,7 +105,7 @@ class SMTSTLConsistencyChecker:
 
         return sorted_model
 
-    def solve(self, table, mode, return_trace, verbose):
+    def solve(self, table, mode, return_trace, verbose, deadline=None):
         # This hashtable will contain the variables for the SMT Solver
         self.smt_variables = {}
 
@@ -135,6 +141,8 @@ class SMTSTLConsistencyChecker:
                 time_limit = time_horizon
 
             for t in range(time_limit):
+                if self._deadline_expired(deadline):
+                    return None
                 encoded_time = self._encode_time(t, time_horizon)
                 prop = f"{key}_t{encoded_time}"
 
@@ -314,6 +322,8 @@ class SMTSTLConsistencyChecker:
                 print("List of implications:", imply_formulas)
 
             for t in range(time_horizon):
+                if self._deadline_expired(deadline):
+                    return None
                 if verbose:
                     print("s.add(Or(")
                 encoded_time = self._encode_time(t, time_horizon)
@@ -348,7 +358,19 @@ class SMTSTLConsistencyChecker:
             print(s.statistics())
             print(s)
 
-        check_res = s.check()
+        if self._deadline_expired(deadline):
+            return None
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining is not None:
+                s.set('timeout', max(int(remaining * 1000), 1))
+            # Cancellation from another thread interrupts the solver
+            deadline.callbacks.append(s.ctx.interrupt)
+        try:
+            check_res = s.check()
+        finally:
+            if deadline is not None:
+                deadline.callbacks.remove(s.ctx.interrupt)
 
         if check_res == unsat:
             if verbose:
@@ -362,11 +384,21 @@ class SMTSTLConsistencyChecker:
                 return self._filter_witness(s.model()), True
             return True
         else:
+            if deadline is not None and deadline.expired():
+                statistics = s.statistics()
+                deadline.statistics.update({
+                    'smt_variables': len(self.smt_variables),
+                    'reason_unknown': s.reason_unknown(),
+                    'solver_statistics': {key: statistics.get_key_value(key) for key in statistics.keys()}
+                })
             print("Unable to check consistency!")
             return None
 
 
-def smt_check_consistency(parsed_formula, mode, return_trace, verbose=False):
+def smt_check_consistency(parsed_formula, mode, return_trace, verbose=False, deadline=None):
+    '''
+    :param deadline: Deadline after which the check gives up and returns None, or None
+    '''
     table = STLAbstractSyntaxTable(parsed_formula)
 
     if verbose:
@@ -374,4 +406,4 @@ def smt_check_consistency(parsed_formula, mode, return_trace, verbose=False):
         table.print()
 
     checker = SMTSTLConsistencyChecker()
-    return checker.solve(table, mode, return_trace, verbose)
+    return checker.solve(table, mode, return_trace, verbose, deadline)
@@ -23,10 +23,16 @@
 import networkx as nx
 import matplotlib.pyplot as plt
 from networkx.drawing.nx_pydot import graphviz_layout
-import bisect
-import concurrent.futures as fs
+import heapq
+import itertools
+import time
 from stl_consistency.node import Node
 from stl_consistency.local_solver import LocalSolver
+from stl_consistency.memo import TrieRejectedStore, LemmaCache, symbols, clear_tables
+from stl_consistency.parallel import parallel_search
+from stl_consistency.checkpoint import Checkpoint, load_checkpoint
+from stl_consistency.trace import extend_trace, trace_segments, format_trace
+from stl_consistency.tree_recorder import TreeRecorder, REJECTED, result_status
 
 
 def modify_U_R(node):
@@ -36,8 +42,9 @@ def modify_U_R(node):
     if node.operator == 'P':
         return node
 
-    for i in range(len(node.operands)):
-        node.operands[i] = modify_U_R(node.operands[i])
+    operands = node.own_operands()
+    for i in range(len(operands)):
+        operands[i] = modify_U_R(operands[i])
 
     # If node.operator is Until, it becomes: (p U[a,b] q) → (p U[a,b] q) ∧ (G[0,a] p)
     if node.operator == 'U' and node.lower > 0:
@@ -108,8 +115,7 @@ def push_negation(node):
     elif node.operator == 'P':
         return node
     else:  # Any non-negated operator
-        new_node = node.shallow_copy()
-        new_node.operands = [push_negation(op) for op in node.operands]
+        new_node = node.shallow_copy([push_negation(op) for op in node.operands])
         return new_node
 
 def shift_bounds(node):
@@ -158,8 +164,7 @@ def remove_GF(node):
         case 'P':
             return node
         case _:
-            new_node = node.shallow_copy()
-            new_node.operands = [remove_GF(op) for op in node.operands]
+            new_node = node.shallow_copy([remove_GF(op) for op in node.operands])
             return new_node
 
 def assign_and_or_element(node):
@@ -185,12 +190,14 @@ def assign_and_or_element(node):
             assign_and_or_element(operand)
 
 
-def count_implications(node, counter=[0]):
+def count_implications(node, counter=None):
     """
     Counts all implications ('->') in the node and in its operands,
     assigning to each a unique identifier.
 
     """
+    if counter is None:
+        counter = [0]
     if not isinstance(node, Node):
         return
     if node.operator == '->':
@@ -208,24 +215,27 @@ def assign_identifier(node):
     :param node:
     :return: assign id to nested operator, such that it is possible to recognize from which nested operator
     an operand has been extracted
+    Boolean variables get separate, dense identifiers, which index the bitmasks of BooleanSolver
     '''
     id_counter = 0
-    # We assign the same identifier to equal P formulas
-    # We use a list instead of a set because lists (node.operands) are unhashable
-    already_assigned = []
+    # We assign the same identifier to equal P formulas, which we find by their formula id
+    real_ids = {}
+    boolean_ids = {}
 
     def do_assign(node):
         nonlocal id_counter
         match node.operator:
             case 'P':
-                prev_id = next(filter(lambda expr_id: expr_id[0] == node.operands, already_assigned), None)
-                if prev_id:
-                    node.identifier = prev_id[1]
+                if len(node.operands) == 1:
+                    node.identifier = boolean_ids.setdefault(node[0], len(boolean_ids))
                 else:
-                    node.identifier = id_counter
-                    already_assigned.append((node.operands, id_counter))
-                    id_counter += 1
+                    node.identifier = real_ids.get(node.get_formula_id())
+                    if node.identifier is None:
+                        node.identifier = real_ids[node.get_formula_id()] = id_counter
+                        id_counter += 1
             case 'G' | 'F' | 'U' | 'R':
+                # Equal temporal subformulas get different identifiers,
+                # because they are used to find the formulas derived from each occurrence
                 node.identifier = id_counter
                 id_counter += 1
                 for operand in node.operands:
@@ -326,19 +336,21 @@ def decompose_all_G_nodes(tableau_opts, outer_node, current_time):
             return extract
         elif short and arg.operator == 'G' and G_node.lower > G_node.initial_time:
             G_counter = 0
-            for i, operand in enumerate(outer_node.operands):
+            outer_operands = outer_node.own_operands()
+            for i, operand in enumerate(outer_operands):
                 if operand.operator == 'G' and operand.is_derived() and operand.parent == G_node.identifier and operand.and_element == arg.and_element:
-                    outer_node.operands[i] = operand.shallow_copy()
-                    outer_node.operands[i].upper += 1
+                    outer_operands[i] = operand.shallow_copy()
+                    outer_operands[i].upper += 1
                     G_counter += 1
                     if G_node.lower == G_node.upper:
-                        outer_node.operands[i].parent = None
+                        outer_operands[i].parent = None
                 elif operand.operator == 'O' and operand.operands[0].operator == 'G' and operand.operands[0].is_derived() and operand.operands[0].parent == G_node.identifier and operand.operands[0].and_element == arg.and_element:
-                    operand.operands[0] = operand.operands[0].shallow_copy()
-                    operand.operands[0].upper += 1
+                    new_G = operand.operands[0].shallow_copy()
+                    new_G.upper += 1
                     G_counter += 1
                     if G_node.lower == G_node.upper:
-                        operand.operands[0].parent = None
+                        new_G.parent = None
+                    outer_operands[i] = Node('O', new_G)
             if G_counter == 0:
                 extract = arg.shallow_copy()
                 extract.lower = arg.lower + G_node.lower
@@ -350,17 +362,15 @@ def decompose_all_G_nodes(tableau_opts, outer_node, current_time):
                 return None
         elif arg.operator in {'&&', ','}:
             # Recursive application
-            arg = arg.shallow_copy()
             new_operands = (modify_argument(op, G_node, short, False) for op in arg.operands)
-            arg.operands = [x for x in new_operands if x is not None]
+            arg = arg.shallow_copy([x for x in new_operands if x is not None])
             if arg.operands:
                 return arg
             else:
                 return None
         elif arg.operator in {'||', '->'}:
-            arg = arg.shallow_copy()
             new_operands = (modify_argument(op, G_node, False, False) for op in arg.operands)
-            arg.operands = [x for x in new_operands if x is not None]
+            arg = arg.shallow_copy([x for x in new_operands if x is not None])
             return arg
         else:
             raise ValueError(f"Unknown operator: {arg.operator}")
@@ -369,6 +379,8 @@ def decompose_all_G_nodes(tableau_opts, outer_node, current_time):
     G_nodes = []
     for i, operand in enumerate(outer_node.operands):
         if operand.operator == 'G' and operand.lower == current_time:
+            if not G_nodes:
+                outer_node.own_operands()
             # We need a shallow_copy for GF because it changes operand.lower
             new_operand = operand.shallow_copy() if operand[0].operator == 'F' else operand
             G_nodes.append(new_operand)
@@ -381,7 +393,8 @@ def decompose_all_G_nodes(tableau_opts, outer_node, current_time):
                     outer_node.jump1 = True
                 # I remove element if  a == b
                 outer_node.operands[i] = None
-    outer_node.operands = [x for x in outer_node.operands if x is not None]
+    if G_nodes:
+        outer_node.operands = [x for x in outer_node.operands if x is not None]
 
     formula_opts = tableau_opts['formula_opts']
     for G_node in G_nodes:
@@ -389,7 +402,7 @@ def decompose_all_G_nodes(tableau_opts, outer_node, current_time):
         # Decompose original node
         new_operands = modify_argument(G_node.operands[0], G_node, formula_opts, formula_opts)
         if new_operands:
-            outer_node.operands.append(new_operands)
+            outer_node.own_operands().append(new_operands)
         if G_node.lower == G_node.upper:
             # Set parent to None (we do it here so that it doesn't interfere with modify_argument)
             for j, other in enumerate(outer_node.operands):
@@ -419,8 +432,7 @@ def decompose_F(node, index):
             return extract
         elif arg.operator in {'&&', '||', ',', '->'}:
             # Recursive application
-            new_arg = arg.shallow_copy()
-            new_arg.operands = [modify_argument(op) for op in arg.operands]
+            new_arg = arg.shallow_copy([modify_argument(op) for op in arg.operands])
             return new_arg
         else:
             raise ValueError(f"Unknown operator: {arg.operator}")
@@ -465,8 +477,7 @@ def decompose_U(formula, index):
             return extract
         elif arg.operator in {'&&', '||', ',', '->'}:
             # Recursive application
-            new_arg = arg.shallow_copy()
-            new_arg.operands = [modify_argument(op, derived) for op in arg.operands]
+            new_arg = arg.shallow_copy([modify_argument(op, derived) for op in arg.operands])
             return new_arg
         else:
             raise ValueError(f"Unknown operator: {arg.operator}")
@@ -474,8 +485,7 @@ def decompose_U(formula, index):
     # Node in which U is not satisfied (p, OU)
     new_node1 = formula.shallow_copy()
     new_operand = modify_argument(first_operand.shallow_copy(), True)
-    new_node1.replace_operand(index, Node('O', U_formula))
-    new_node1.operands.extend([new_operand])
+    new_node1.replace_operand(index, Node('O', U_formula), new_operand)
 
     # Node where U is satisfied (q)
     new_node2 = formula.shallow_copy()
@@ -521,8 +531,7 @@ def decompose_R(formula, index):
             return extract
         elif arg.operator in {'&&', '||', ',', '->'}:
             # Recursive application
-            new_arg = arg.shallow_copy()
-            new_arg.operands = [modify_argument(op, derived) for op in arg.operands]
+            new_arg = arg.shallow_copy([modify_argument(op, derived) for op in arg.operands])
             return new_arg
         else:
             raise ValueError(f"Unknown operator: {arg.operator}")
@@ -531,8 +540,7 @@ def decompose_R(formula, index):
     new_node1 = formula.shallow_copy()
     if R_formula.lower < R_formula.upper:
         new_operand = modify_argument(second_operand.shallow_copy(), True)
-        new_node1.replace_operand(index, Node('O', R_formula))
-        new_node1.operands.extend([new_operand])
+        new_node1.replace_operand(index, Node('O', R_formula), new_operand)
     else:
         new_operand = modify_argument(second_operand.shallow_copy(), False)
         new_node1.replace_operand(index, new_operand)
@@ -570,8 +578,7 @@ def decompose_or(tableau_opts, node, index):
     # I compute a score to decide the order in which the operands of OR are returned
     def complexity_score(or_node, node):
         def check_match(sub1, sub2):
-            return sub1.operator == sub2.operator and ((sub1.operator == 'P' and sub1.operands == sub2.operands) or (
-                        sub1.operator == '!' and sub1[0].operands == sub2[0].operands))
+            return sub1.operator in {'P', '!'} and sub1 == sub2
         """Compute score penalizing nested operators."""
         # 1. Operatori con solo 'P' → Migliori
         if or_node.operator in {'P', '!'}:
@@ -622,18 +629,23 @@ def decompose_or(tableau_opts, node, index):
         new_node = node.shallow_copy()
         if or_operand.is_derived() and or_operand.or_element > -1:
             z = 0
-            for element in new_node.operands:
+            new_operands = new_node.own_operands()
+            for i, element in enumerate(new_operands):
+                # Operands are shared with node and its other children, so we modify copies
                 if element.operator == 'G' and element.parent == or_operand.parent and element.or_element == or_operand.or_element:
                     z += 1
-                    element.upper = or_operand.upper
+                    new_operands[i] = element.shallow_copy()
+                    new_operands[i].upper = or_operand.upper
                 elif element.operator == 'O' and element.operands[0].operator == 'G' and element.operands[0].is_derived() and element.operands[0].parent == or_operand.parent and element.operands[0].or_element == or_operand.or_element:
                     z += 1
-                    element.operands[0].upper = or_operand.upper
+                    new_G = element.operands[0].shallow_copy()
+                    new_G.upper = or_operand.upper
+                    new_operands[i] = Node('O', new_G)
             if z == 0:
                 new_node.replace_operand(index, or_operand)
             else:
                 # We modified some exisiting G, so we don't need to add more formulas
-                del new_node.operands[index]
+                new_node.remove_operand(index)
         else:
             new_node.replace_operand(index, or_operand)
         res.append(new_node)
@@ -661,7 +673,7 @@ def decompose_imply_classic(tableau_data, node, index, mode='sat'):
             for i, operand in enumerate(new_node.operands):
                 if operand.operator == 'G' and operand.parent == imply_op.parent and operand.is_derived() and operand.id_implication == imply_op.id_implication:
                     # We are modifying the existing G node, so we need to make a copy
-                    new_node.operands[i] = operand.shallow_copy()
+                    new_node.replace_operand(i, operand.shallow_copy())
                     new_node.operands[i].upper = operand.upper
                     return None
         return imply_op
@@ -684,7 +696,7 @@ def decompose_imply_classic(tableau_data, node, index, mode='sat'):
 
     if imply_formula.identifier is not None and mode == 'strong_sat':
         skip = imply_formula.identifier in new_node2.satisfied_implications
-        new_node2.satisfied_implications.add(imply_formula.identifier)
+        new_node2.satisfied_implications = new_node2.satisfied_implications | {imply_formula.identifier}
     else:
         # TODO this is needed because sometimes imply_formula.identifier is None (req_cps): find out why and fix it
         skip = True
@@ -693,7 +705,7 @@ def decompose_imply_classic(tableau_data, node, index, mode='sat'):
         # heuristics:if in the formula I already have the expression of the antecedent that should be true
         # I return first the branch in which the antecedent is evaluated to true, to avoid a rejected branch
         def check_match(sub1, sub2):
-            return sub1.operator == sub2.operator and ((sub1.operator == 'P' and sub1.operands == sub2.operands) or (sub1.operator == '!' and sub1[0].operands == sub2[0].operands))
+            return sub1.operator in {'P', '!'} and sub1 == sub2
         if lhs.operator in {'P', '!'}:
             for operand in node.operands:
                 if check_match(lhs, operand):
@@ -725,7 +737,7 @@ def decompose_imply_new(node, index):
     new_node2 = node.shallow_copy()
     new_node2.replace_operand(index, lhs, rhs)
     if node.operands[index].identifier is not None:
-        new_node2.satisfied_implications.add(node.operands[index].identifier)
+        new_node2.satisfied_implications = new_node2.satisfied_implications | {node.operands[index].identifier}
     new_node1 = node.shallow_copy()
     new_node1.replace_operand(index, push_negation(Node('!', lhs)))
     new_node1 = push_negation(new_node1)
@@ -752,7 +764,7 @@ def simplify_F(node):
             else:
                 F_formulas[operand] = {(i, formula)}
     for i in sorted(remove_indices, reverse=True):
-        del node.operands[i]
+        node.remove_operand(i)
     return node
 
 
@@ -768,12 +780,26 @@ def has_temporal_operator(node):
             return any(has_temporal_operator(operand) for operand in node)
     return False
 
+# Properties of the operands of temporal operators that matter for the jump rule, indexed by formula id.
+# They only depend on the structure of the operand, so they can be computed once for all tableau nodes containing it.
+temporal_operand_info = {}
+
+def get_temporal_operand_info(node):
+    '''
+    :param node: a G, U or R node
+    :return: a pair (True if the operand of node that is checked at every time instant (the first one for G and U,
+             the second one for R) contains temporal operators, maximum upper bound of the operand (see Node.get_max_upper))
+    '''
+    operand = node[1] if node.operator == 'R' else node[0]
+    key = operand.get_formula_id()
+    info = temporal_operand_info.get(key)
+    if info is None:
+        info = temporal_operand_info[key] = (has_temporal_operator(operand), operand.get_max_upper())
+    return info
+
 def is_complex_temporal_operator(node):
-    match node.operator:
-        case 'G' | 'U':
-            return has_temporal_operator(node[0])
-        case 'R':
-            return has_temporal_operator(node[1])
+    if node.operator in {'G', 'U', 'R'}:
+        return get_temporal_operand_info(node)[0]
     return False
 
 def flagging(node):
@@ -785,39 +811,31 @@ def flagging(node):
         case ',' | '&&' | '||' | '!' | '->':
             return any(flagging(operand) for operand in node)
         case 'O':
-            match node[0].operator:
-                case 'G' | 'U':
-                    return has_temporal_operator(node[0][0])
-                case 'R':
-                    return has_temporal_operator(node[0][1])
+            if node[0].operator in {'G', 'U', 'R'}:
+                return get_temporal_operand_info(node[0])[0]
             return False
     return False
 
-def extract_time_instants(node, flag):
+def next_time_instant(node, flag):
     """
-    :return: it return the extrema of all time interval of temporal operators in the formula
-    as a vector in ascending order
-    (does not include bounds of derived operators)
+    :return: the smallest extremum of the time intervals of temporal operators in node that is greater
+    than the current time of node (ignoring bounds of derived operators if flag is True),
+    or None if there is no such extremum
     """
-    time_instants = []
-    if flag:
-        for elem in node:
-            if elem.operator in {'G', 'F', 'U', 'R'} and not elem.is_derived():
-                time_instants.append(elem.lower)
-                time_instants.append(elem.upper)
-            elif elem.operator == 'O' and not elem.operands[0].is_derived():
-                time_instants.append(elem.operands[0].lower)
-                time_instants.append(elem.operands[0].upper)
-    else:
-        for elem in node:
-            if elem.operator in {'G', 'F', 'U', 'R'}:
-                time_instants.append(elem.lower)
-                time_instants.append(elem.upper)
-            elif elem.operator == 'O':
-                time_instants.append(elem.operands[0].lower)
-                time_instants.append(elem.operands[0].upper)
-
-    return sorted(time_instants)
+    current_time = node.current_time
+    next_time = None
+    for elem in node:
+        if elem.operator == 'O':
+            elem = elem.operands[0]
+        elif elem.operator not in {'G', 'F', 'U', 'R'}:
+            continue
+        if flag and elem.is_derived():
+            continue
+        if current_time < elem.lower and (next_time is None or elem.lower < next_time):
+            next_time = elem.lower
+        elif current_time < elem.upper and (next_time is None or elem.upper < next_time):
+            next_time = elem.upper
+    return next_time
 
 def decompose_jump(tableau_data, node):
     '''
@@ -825,22 +843,20 @@ def decompose_jump(tableau_data, node):
     or if it is problematic (you cannot always jump, when you do not meet jump conditions you have to set jump = 1)
     '''
     assert node.operator == ','
-    trace_stack = tableau_data.trace_stack
-    if trace_stack is not None:
-        trace_stack.append([])
+    return_trace = tableau_data.return_trace
+    literals = [] # literals at the current time instant, added to the trace (see stl_consistency.trace)
 
     flag = flagging(node)
-    time_instants = extract_time_instants(node, flag)
+    next_time = next_time_instant(node, flag)
     if not flag:  # no problematic operator is currently active
-        if not time_instants:
-            # there are no temporal operators, we just return None
+        if next_time is None:
+            # there are no (active) temporal operators, we just return None
             return None
         if node.jump1:
             new_time = node.current_time + 1
         else:
-            # I find the next min in the vector of time instants
-            indice = bisect.bisect_right(time_instants, node.current_time)
-            new_time = time_instants[indice]
+            # I jump to the next min among the time instants in the formula
+            new_time = next_time
         
         new_operands = []
         for and_operand in node.operands:
@@ -850,17 +866,16 @@ def decompose_jump(tableau_data, node):
                 sub_formula = and_operand.operands[0].shallow_copy()
                 sub_formula.lower = new_time
                 new_operands.append(sub_formula)
-            elif trace_stack is not None and and_operand.operator in {'P', '!'}:
-                trace_stack[-1].append(str(and_operand))
+            elif return_trace and and_operand.operator in {'P', '!'}:
+                literals.append(str(and_operand))
 
-        if trace_stack is not None:
-            repetitions = new_time - node.current_time - 1
-            trace_stack.extend([trace_stack[-1]] * repetitions)
+        if return_trace:
+            # The literals hold until the time we jump to
+            tableau_data.trace = extend_trace(tableau_data.trace, node.current_time, new_time, literals)
 
         if new_operands:
-            new_node = node.shallow_copy()
+            new_node = node.shallow_copy(new_operands)
             new_node.jump1 = False
-            new_node.operands = new_operands
             new_node.current_time = new_time
             if tableau_data.tableau_opts['formula_opts'] and len(new_node.operands) > 1:
                 simplify_F(new_node)
@@ -880,20 +895,14 @@ def decompose_jump(tableau_data, node):
                 # otherwise jump = 1
                 # Once I have computed the jump for all problematic operators I select the min and jump
                 if and_operand.operator == 'O' and not and_operand.operands[0].is_derived() and and_operand.operands[0].operator in {'G', 'U', 'R'}:
-                    max_upper = -1
                     o_operand = and_operand.operands[0]
-                    if o_operand.operator in {'G', 'U'}:
-                        max_upper = o_operand.operands[0].get_max_upper()
-                    elif o_operand.operator == 'R':
-                        max_upper = o_operand.operands[1].get_max_upper()
-
+                    max_upper = get_temporal_operand_info(o_operand)[1]
                     must_jump_1 = must_jump_1 or max_upper == -1 or o_operand.lower < o_operand.initial_time + max_upper
 
-            if must_jump_1:
+            if must_jump_1 or next_time is None:
                 jump = 1
             else:
-                indice = bisect.bisect_right(time_instants, node.current_time)
-                jump = time_instants[indice] - node.current_time
+                jump = next_time - node.current_time
         # Now we build the new node after the jump
         new_node_operands = []
         for and_operand in node.operands:
@@ -914,15 +923,14 @@ def decompose_jump(tableau_data, node):
                         sub_formula = and_operand.operands[0].shallow_copy()
                         sub_formula.lower = sub_formula.lower + jump
                         new_node_operands.append(sub_formula)
-            elif trace_stack is not None and and_operand.operator in {'P', '!'}:
-                trace_stack[-1].append(str(and_operand))
+            elif return_trace and and_operand.operator in {'P', '!'}:
+                literals.append(str(and_operand))
 
-        if trace_stack is not None:
-            # I add to the trace the atomic elements as many times ad the jump
-            trace_stack.extend([trace_stack[-1]] * (jump - 1))
+        if return_trace:
+            # I add to the trace the atomic elements for all time instants of the jump
+            tableau_data.trace = extend_trace(tableau_data.trace, node.current_time, node.current_time + jump, literals)
         
-        new_node = node.shallow_copy()
-        new_node.operands = new_node_operands
+        new_node = node.shallow_copy(new_node_operands)
         new_node.current_time = node.current_time + jump
         if tableau_data.tableau_opts['formula_opts'] and len(new_node.operands) > 1:
             simplify_F(new_node)
@@ -933,12 +941,143 @@ def decompose_jump(tableau_data, node):
         if not tableau_data.tableau_opts['simple_nodes_first'] or len(simple_node_operands) == len(new_node.operands) or not simple_node_operands:
             return [new_node]
         else:
-            simple_node = new_node.shallow_copy()
-            simple_node.operands = simple_node_operands
+            simple_node = new_node.shallow_copy(simple_node_operands)
             simple_node.siblings_imply = True
             return [simple_node, new_node]
 
 
+# Time horizon of formulas, indexed by formula id (see formula_horizon)
+formula_horizons = {}
+
+def formula_horizon(node):
+    '''
+    :return: the largest time instant, relative to the time at which node must hold, on which node depends
+    '''
+    key = node.get_formula_id()
+    horizon = formula_horizons.get(key)
+    if horizon is None:
+        horizon = max((formula_horizon(op) for op in node.operands if isinstance(op, Node)), default=0)
+        if node.operator in {'G', 'F', 'U', 'R'}:
+            horizon += node.upper
+        formula_horizons[key] = horizon
+    return horizon
+
+def clear_formula_tables(formula=None):
+    '''
+    Clears Node.unique_table and all tables indexed by formula ids, which would otherwise grow across tableau runs.
+    Ids are only valid within a run: nodes of previous runs must not be used afterwards, except formula,
+    whose cached ids are reset.
+    '''
+    Node.unique_table.clear()
+    temporal_operand_info.clear()
+    formula_horizons.clear()
+    clear_tables()
+    if formula is not None:
+        formula.reset_formula_ids()
+
+def time_normalized_state(node):
+    '''
+    The horizon of node is the time, relative to its current time, beyond which the tableau cannot derive
+    obligations from node before getting close to some far bound.
+    Far bounds are the upper bounds of G and R operators and the lower bounds of all temporal operators beyond the horizon.
+    Until the current time gets close to them, operands with far bounds behave in the same way at every time instant,
+    and operands with a far lower bound are not even decomposed.
+    :return: a tuple (key, horizon, far, pending) where key identifies node up to a shift of time,
+             except for the far bounds, which are compared as they are, far is the list of the far bounds,
+             and pending is True if some operand has a far lower bound
+    '''
+    time = node.current_time
+    events = [] # (bound, horizon of the obligations derived from the operand when the bound is reached), relative to time
+    for op in node.operands:
+        if op.operator in {'G', 'R'}:
+            body_horizon = max(formula_horizon(arg) for arg in op.operands)
+            events.append((op.lower - time, op.lower - time + body_horizon))
+            events.append((op.upper - time, op.upper - time + body_horizon))
+        elif op.operator in {'F', 'U'}:
+            events.append((op.lower - time, formula_horizon(op) - time))
+        else:
+            events.append((0, formula_horizon(op) - time))
+    horizon = 2
+    for bound, bound_horizon in sorted(events):
+        if bound > horizon:
+            break
+        # The obligations derived when the bound is reached may make other bounds close
+        horizon = max(horizon, bound_horizon + 2)
+
+    key = []
+    fixed = []
+    far = []
+    pending = False
+    for op in node.operands:
+        args = tuple(arg.get_formula_id() for arg in op.operands if isinstance(arg, Node)) or op.get_formula_id()
+        if op.operator in {'G', 'F', 'U', 'R'}:
+            if op.lower - time > horizon:
+                fixed.append(('lower', op.get_formula_id(), op.initial_time if isinstance(op.initial_time, int) else -1,
+                              op.identifier if op.identifier is not None else -1, op.parent if op.parent is not None else -1))
+                far.append(op.lower)
+                pending = True
+                continue
+            lower, upper = op.lower - time, op.upper - time
+            if op.operator in {'G', 'R'} and upper > horizon:
+                # The far bound is kept together with its operand (whose formula id changes with its lower bound),
+                # so that operands with swapped bounds differ
+                fixed.append(('upper', op.operator, args, op.identifier if op.identifier is not None else -1, op.upper))
+                far.append(op.upper)
+                upper = -1
+            # Only the first instants after initial_time matter for the decomposition of G, U and R (see decompose_jump)
+            cap = max(get_temporal_operand_info(op)[1], 1) if op.operator != 'F' else 1
+            initial = min(op.lower - op.initial_time, cap) if isinstance(op.initial_time, int) else -1
+        else:
+            lower = upper = initial = -1
+        key.append((op.operator, args,
+                    lower, upper, initial, op.identifier if op.identifier is not None else -1, op.parent if op.parent is not None else -1,
+                    op.and_element, op.or_element, op.id_implication))
+    key.sort()
+    fixed.sort()
+    return (node.jump1, tuple(key), tuple(fixed)), horizon, far, pending
+
+def stutter_jump(node, state, branch_states):
+    '''
+    If node, the first node of a time instant, has the same time-normalized state (see time_normalized_state)
+    as the first node of an earlier time instant of the same branch, the tableau can reach the same state again
+    from node by repeating the decompositions made in between, as long as far bounds stay far.
+    So we fast-forward by as many whole periods as possible before the next far bound gets close,
+    carrying the G and R operators with far upper bounds as single interval obligations.
+    The resulting node is reachable from node, so if it is satisfiable node is too.
+    If no operand has a far lower bound (see time_normalized_state), node also implies the resulting node
+    (see Node.implies_quick), because only the far upper bounds of G and R operators get closer, so they are equisatisfiable.
+    :param state: time_normalized_state of node
+    :param branch_states: dict mapping the keys of the time-normalized states of the first nodes of the time instants
+                          of the branch to the list of TableauFrame's of such nodes
+    :return: the node after the skipped periods, or node if it cannot skip any
+    '''
+    key, horizon, far, _ = state
+    frames = branch_states.get(key)
+    if not frames or not far:
+        return node
+    time = node.current_time
+    period = time - frames[-1].node.current_time
+    # Far bounds must stay beyond the horizon during the last period
+    periods = (min(far) - time - horizon - period - 1) // period
+    if periods < 1:
+        return node
+    shift = periods * period
+    new_operands = []
+    for op in node.operands:
+        if op.operator in {'G', 'F', 'U', 'R'} and op.lower - time <= horizon:
+            op = op.shallow_copy()
+            op.lower += shift
+            if not (op.operator in {'G', 'R'} and op.upper - time > horizon):
+                op.upper += shift
+            if isinstance(op.initial_time, int):
+                op.initial_time += shift
+        new_operands.append(op)
+    new_node = node.shallow_copy(new_operands)
+    new_node.current_time = time + shift
+    new_node.siblings_imply = node.siblings_imply
+    return new_node
+
+
 def local_consistency_check(local_solver, node):
     '''
     :return: True if node is consistent, False otherwise
@@ -957,7 +1096,7 @@ def local_consistency_check(local_solver, node):
                         return False # we have false in the upper level of a node
                     elif prop == 'true':
                         continue # if we have true in the upper level of a node we can just ignore it
-                    local_solver.add_boolean_constraint(False, prop)
+                    local_solver.add_boolean_constraint(False, operand)
             case '!':
                 if operand[0][0] in {'<', '<=', '>', '>=', '==', '!='}:
                     local_solver.add_real_constraint(True, operand[0])
@@ -967,154 +1106,606 @@ def local_consistency_check(local_solver, node):
                         return False # we have !true in the upper level of a node
                     elif prop == 'false':
                         continue # if we have !false in the upper level of a node we can just ignore it
-                    local_solver.add_boolean_constraint(True, prop)
+                    local_solver.add_boolean_constraint(True, operand[0])
 
     return local_solver.check()
 
 
-def add_tree_child(tableau_data, G, parent_label, child):
-    tableau_data.counter += 1
+def local_conflict(local_solver, node):
+    '''
+    To be called after local_consistency_check(local_solver, node) returned False.
+    :return: the set of variables (see memo.symbols) occurring in an unsatisfiable subset of the literals of node
+             or in its expired operator, or None if it cannot be computed
+    '''
+    for operand in node.operands:
+        match operand.operator:
+            case 'O':
+                if operand[0].operator in {'F', 'U'} and operand[0].lower == operand[0].upper:
+                    return set(symbols(operand))
+            case 'P':
+                if operand[0] == 'false':
+                    return {'false'}
+            case '!':
+                if operand[0][0] == 'true':
+                    return {'true'}
+    core = local_solver.unsat_core()
+    if core is None:
+        return None
+    return set().union(*(symbols(literal) for _, literal in core))
+
+def conflict_core(node, reason):
+    '''
+    :param reason: set of variables such that all branches of the subtree rooted at node are rejected
+                   because of literals, expired operators or memoized nodes (see MemoEntry.symbols) containing only them
+    :return: a node made of the operands of node containing some variable in reason,
+             which is rejected by itself: the other operands cannot produce nor prevent these rejections
+    '''
+    core_operands = [op for op in node.operands if not symbols(op).isdisjoint(reason)]
+    if not core_operands or len(core_operands) == len(node.operands):
+        return node
+    return node.shallow_copy(core_operands)
+
+
+def add_tree_child(tableau_data, parent_id, child):
+    '''
+    Records child as a child of the node with id parent_id in tableau_data.tree (see TreeRecorder).
+    :return: the id of child
+    '''
+    child_id = tableau_data.tree.add(child, parent_id)
     if isinstance(child, str):
-        child_label = child + ' ' + str(tableau_data.counter)
-    else:
-        child.counter = tableau_data.counter
-        child_label = child.to_label()
-    G.add_node(child_label)
-    G.add_edge(parent_label, child_label)
+        # Leaves labelled by strings are rejected
+        tableau_data.tree.set_status(child_id, REJECTED)
+    return child_id
 
 def add_rejected(tableau_data, node):
+    '''
+    :return: True if node has been added to the rejected store,
+             False if memoization is disabled or node implies an already rejected node
+    '''
     if tableau_data.tableau_opts['memoization'] and not check_rejected(tableau_data, node):
         #print(node)
-        bisect.insort_left(tableau_data.rejected_store, node, key=Node.get_imply_sort_key)
+        tableau_data.rejected_store.add(node)
+        return True
+    return False
 
 def check_rejected(tableau_data, node):
+    '''
+    :return: the entry of the rejected store implied by node (see MemoEntry), or None
+    '''
     if not tableau_data.tableau_opts['memoization']:
-        return False
+        return None
     node.sort_operands()
-    max_lower = max((op.lower for op in node.operands if op.operator in {'G', 'F', 'U', 'R'}))
-    i = bisect.bisect_left(tableau_data.rejected_store, node.get_imply_sort_key(max_lower), key=Node.get_imply_sort_key)
-    for rejected in tableau_data.rejected_store[i:]:
-        if node.implies_quick(rejected):
-            if tableau_data.verbose:
-                print('Rejecting', node, ' because it implies rejected node ', rejected)
-            return True
-        if node.operands[-1].get_imply_search_key() < rejected.operands[0].get_imply_search_key():
-            return False
-    return False
+    entry = tableau_data.rejected_store.find_implied(node)
+    if entry is not None and tableau_data.verbose:
+        print('Rejecting', node, ' because it implies a rejected node')
+    return entry
 
-def add_children(tableau_data, local_solver, node, depth, last_spawned, max_depth, current_time):
-    if local_solver is None:
-        local_solver = LocalSolver()
+class TableauFrame:
+    '''
+    A tableau node whose children are being explored by add_children
+    '''
+    __slots__ = ('node', 'local_solver', 'depth', 'trace', 'children', 'child', 'max_depth_reached', 'complete_result', 'donated', 'reason', 'cores', 'state', 'stutter_fallback')
+
+    def __init__(self, node, local_solver, depth, trace, children):
+        self.node = node
+        self.local_solver = local_solver # solver scope pushed for node, popped when the frame is closed
+        self.depth = depth
+        self.trace = trace # trace of the branch up to the children of node (see TableauData.trace)
+        self.children = iter(children)
+        self.child = None # child currently being explored
+        self.max_depth_reached = False
+        self.complete_result = False
+        self.donated = False # True if part of the subtree has been donated to other workers in the parallel tableau
+        # Variables causing the rejection of the children explored so far (see conflict_core), None if unknown
+        self.reason = None
+        self.cores = [] # pairs (time, set of formula ids of the operands) of conflict cores of rejected children
+        self.state = None # time_normalized_state of node, if it is the first node of a time instant (see stutter_jump)
+        self.stutter_fallback = None # child to be explored if the node obtained from it by stutter_jump is rejected
+
+    def next_child(self):
+        '''
+        :return: the next child to be explored, skipping those containing the conflict core of a rejected sibling
+        '''
+        for child in self.children:
+            if self.cores:
+                ids = {op.get_formula_id() for op in child.operands}
+                if any(time == child.current_time and core <= ids for time, core in self.cores):
+                    continue
+            return child
+        return None
+
+
+def expand_node(tableau_data, local_solver, node, depth, max_depth, conflicts=None):
+    '''
+    Decomposes node and selects which of its children must be explored.
+    Constraints from node are added to the current scope of local_solver.
+    :param conflicts: if not None, list to which the reasons why node or its children are rejected
+                      are appended (see conflict_core), or None if they cannot be computed
+    :return: the list of children of node to be explored, with the simple child (if any) first,
+             or the result for the subtree rooted at node if it is a leaf (see build_decomposition_tree)
+    '''
     mode = tableau_data.mode
 
     if depth >= max_depth:
         print('Max depth reached!')
         return None
 
-    if tableau_data.tree:
-        node_label = node.to_label()
+    tableau_data.expanded_nodes += 1
+    if tableau_data.tree is not None:
+        node_id = node.counter
 
     current_time = node.current_time
-    local_solver.push()
     children = decompose(tableau_data, local_solver, node, current_time)
     if children is None:
-        local_solver.pop()
         if tableau_data.verbose:
             print('No more children in this branch')
-        if tableau_data.trace_stack is not None:
-            # I add last element otherwise it would not be added since it does not go through decompose_jump
-            for element in node.operands:
-                if element.operator in {'P', '!'}:
-                    tableau_data.trace_stack[-1].append(str(element))
+        trace = tableau_data.trace
+        if tableau_data.return_trace and not (trace is not None and trace[0][1] > current_time):
+            # I add last instant otherwise it would not be added since decompose_jump did not jump from it
+            literals = [str(element) for element in node.operands if element.operator in {'P', '!'}]
+            tableau_data.trace = extend_trace(trace, current_time, current_time + 1, literals)
         if mode in {'sat', 'complete'}:
-            return True
+            res = True
         elif mode == 'strong_sat':
-            return len(node.satisfied_implications) == tableau_data.number_of_implications
+            res = len(node.satisfied_implications) == tableau_data.number_of_implications
+        if res:
+            # The trace of the last accepting branch is the witness (accepting branches of simple nodes come first)
+            tableau_data.witness = tableau_data.trace
+        return res
     if tableau_data.verbose:
         for child in children:
             print(child)
 
     child_queue = []
     for child in children:
-        if child != 'Rejected':
+        if child == 'Rejected':
+            if conflicts is not None:
+                conflicts.append(local_conflict(local_solver, node))
+        else:
             if child.siblings_imply:
+                # Simple nodes are useless in the other modes: in strong_sat, the other children may satisfy implications
+                # that this one does not contain, so they are not rejected with it,
+                # and in complete mode its whole subtree would be explored in addition to theirs
                 if mode == 'sat':
-                    if check_rejected(tableau_data, child):
+                    entry = check_rejected(tableau_data, child)
+                    if entry is not None:
                         # All other children imply this one, so they'll be rejected
+                        if conflicts is not None:
+                            conflicts.append(entry.symbols())
                         child_queue = []
-                        if tableau_data.tree:
-                            add_tree_child(tableau_data, tableau_data.tree, node_label, 'Rejected (memo)')
+                        if tableau_data.tree is not None:
+                            add_tree_child(tableau_data, node_id, 'Rejected (memo)')
                         break
                     else:
                         # Children implied by others must be analyzed first
                         child_queue.insert(0, child)
             else:
-                if mode != 'sat' or child.current_time == current_time or not check_rejected(tableau_data, child):
+                entry = None if child.current_time == current_time else check_rejected(tableau_data, child)
+                if entry is None:
                     child_queue.append(child)
-                elif tableau_data.tree and mode == 'sat':
-                    add_tree_child(tableau_data, tableau_data.tree, node_label, child)
-                    node_label = child.to_label()
-                    child = 'Rejected (memo)'
-        if tableau_data.tree:
-            add_tree_child(tableau_data, tableau_data.tree, node_label, child)
+                else:
+                    if conflicts is not None:
+                        conflicts.append(entry.symbols())
+                    if tableau_data.tree is not None:
+                        node_id = add_tree_child(tableau_data, node_id, child)
+                        child = 'Rejected (memo)'
+        if tableau_data.tree is not None:
+            add_tree_child(tableau_data, node_id, child)
     
     if all(c.siblings_imply for c in child_queue):
         child_queue = []
+    return child_queue
 
-    if mode == 'complete':
-        complete_result = False
-
-    if tableau_data.parallel and mode == 'sat' and depth - last_spawned > 30 and len(child_queue) > 1: # add 'strong_sat'
-        # print("spawning", node)
-        # print("children: ", str([child for child in child_queue]))
-
-        pool = fs.ProcessPoolExecutor(max_workers=2)
-        try:
-            futures = [pool.submit(
-                add_children,
-                tableau_data,
-                None, # z3 stuff can't be pickled
-                child, depth + 1, depth, max_depth, current_time
-            ) for child in child_queue]
-            for fut in fs.as_completed(futures):
-                if fut.result():
-                    local_solver.pop()
-                    return True
-        finally:
-            # We wait for running subtask to finish, otherwise they remain hanging.
-            # TODO maybe use Event to stop them asap
-            pool.shutdown(wait=True, cancel_futures=True)
-    else:
-        max_depth_reached = False
-        for child in child_queue:
-            # If the child comes from a temporal jump, we need a new, empty solver
-            child_solver = local_solver if child.current_time == current_time else local_solver.get_empty_solver()
-            child_res = add_children(tableau_data, child_solver, child, depth + 1, last_spawned, max_depth, current_time)
-            if child_res:
+def open_node(tableau_data, local_solver, node, depth, max_depth):
+    '''
+    Decomposes node in a new scope of local_solver.
+    :return: a TableauFrame if node has children to be explored,
+             the result for the subtree rooted at node otherwise (see build_decomposition_tree)
+    '''
+    local_solver.push()
+    conflicts = [] if tableau_data.conflict_learning else None
+    child_queue = expand_node(tableau_data, local_solver, node, depth, max_depth, conflicts)
+    if not isinstance(child_queue, list):
+        local_solver.pop()
+        return child_queue
+    frame = TableauFrame(node, local_solver, depth, tableau_data.trace, child_queue)
+    # An empty reason comes from constraints without variables, which conflict_core could not trace back
+    if conflicts is not None and all(conflicts):
+        frame.reason = set().union(*conflicts)
+    return frame
+
+def close_frame(tableau_data, frame):
+    '''
+    :return: the result for the subtree rooted at frame.node, after all its children have been explored
+    '''
+    frame.local_solver.pop()
+    if tableau_data.mode in {'sat', 'strong_sat'}:
+        if frame.max_depth_reached:
+            return None
+        return False
+    else: # mode == 'complete'
+        if not frame.complete_result and frame.max_depth_reached:
+            return None
+        return frame.complete_result
+
+def donate_child(work_pool, stack):
+    '''
+    Donates to work_pool the next unexplored child of the frame closest to the root
+    whose children can be explored independently.
+    '''
+    for frame in stack:
+        if frame.node.siblings_imply:
+            # Accepting branches of simple nodes are ignored, so their subtrees cannot be shared
+            return
+        # Frames whose first child is simple explore their other children only after it
+        if frame.child is not None and not frame.child.siblings_imply:
+            child = next(frame.children, None)
+            if child is not None:
+                frame.donated = True
+                frame.reason = None
+                work_pool.donate(child, frame.depth + 1)
+                return
+
+def frontier_entry(node, depth, trace):
+    '''
+    :param trace: trace of the branch up to node (see TableauData.trace)
+    :return: the entry of node in the frontier of a Checkpoint
+    '''
+    return node, depth, trace
+
+def record_frontier(tableau_data, stack, node, depth):
+    '''
+    Adds node, which reached the depth limit, to the frontier of the next checkpoint,
+    unless it is in the subtree of a simple node (see Checkpoint)
+    '''
+    if tableau_data.frontier is not None and not any(frame.child.siblings_imply for frame in stack):
+        tableau_data.frontier.append(frontier_entry(node, depth, tableau_data.trace))
+
+def stack_frontier(tableau_data, stack):
+    '''
+    :return: the frontier entries (see frontier_entry) of the unexplored children of the frames in stack,
+             and True if some frame has an accepting child ('complete' mode)
+    '''
+    frontier = []
+    accepted = False
+    for frame in stack:
+        remaining = list(iter(frame.next_child, None))
+        frame.children = iter(remaining)
+        frontier.extend(frontier_entry(child, frame.depth + 1, frame.trace) for child in remaining)
+        accepted = accepted or frame.complete_result
+        if frame.child is not None and frame.child.siblings_imply:
+            break
+    return frontier, accepted
+
+def save_checkpoint(tableau_data, stack=()):
+    '''
+    Saves a Checkpoint of the search to tableau_data.checkpoint.
+    Its frontier contains the nodes that reached the depth limit so far, the unexplored children of the frames in stack,
+    and the nodes of the resumed checkpoint that have not been explored yet.
+    '''
+    frontier, accepted = stack_frontier(tableau_data, stack)
+    frontier = tableau_data.frontier + frontier
+    accepted = accepted or tableau_data.accepted
+    frontier.extend(reversed(tableau_data.pending))
+    Checkpoint(
+        tableau_data.mode,
+        tableau_data.tableau_opts,
+        tableau_data.number_of_implications,
+        frontier,
+        tableau_data.rejected_store.export_entries(),
+        traces=tableau_data.return_trace,
+        accepted=accepted,
+        memo_max_entries=tableau_data.rejected_store.max_entries,
+        memo_eviction=tableau_data.rejected_store.eviction,
+        expanded_nodes=tableau_data.expanded_nodes
+    ).save(tableau_data.checkpoint)
+    if tableau_data.verbose:
+        print(f'Saved checkpoint with {len(frontier)} frontier nodes to {tableau_data.checkpoint}')
+
+def add_children(tableau_data, local_solver, node, depth, max_depth, work_pool=None):
+    '''
+    Explores the subtree of the tableau rooted at node depth-first.
+    The search is iterative: an explicit stack of TableauFrame's replaces recursion,
+    so the depth of the tableau is only bounded by max_depth.
+    With conflict learning, a rejected child is memoized through its conflict core (see conflict_core),
+    and its siblings containing the same core are skipped: the search backjumps to the closest ancestor
+    whose decomposition produced some operand of the core.
+    The time-normalized states of the first nodes of the time instants in the branch are indexed by their keys,
+    so that periodic repetitions of a state are detected in constant time and skipped (see stutter_jump).
+    :param work_pool: if not None, WorkPool of the parallel tableau to which parts of the subtree are donated
+    :return: the result for the subtree rooted at node (see build_decomposition_tree)
+             (in the parallel tableau, only for the part of the subtree that has not been donated)
+    '''
+    mode = tableau_data.mode
+
+    stack = []
+    branch_states = {} # see stutter_jump
+    child_state = None # time_normalized_state of the node being opened, if already computed
+
+    def pop_frame():
+        frame = stack.pop()
+        if frame.state is not None:
+            branch_states[frame.state[0]].pop()
+        return frame
+
+    res = open_node(tableau_data, local_solver, node, depth, max_depth)
+    if res is None:
+        record_frontier(tableau_data, stack, node, depth)
+    res_donated = False # True if part of the subtree whose result is res has been donated
+    res_reason = None # if res is False, the variables causing the rejection of its subtree (see conflict_core), or None
+    while True:
+        if work_pool is not None and work_pool.is_cancelled():
+            # The result of the parallel search is already known
+            return None
+        if isinstance(res, TableauFrame):
+            if tableau_data.stutter_jump and (not stack or stack[-1].node.current_time < res.node.current_time):
+                res.state = child_state if child_state is not None else time_normalized_state(res.node)
+                branch_states.setdefault(res.state[0], []).append(res)
+            stack.append(res)
+            frame = res
+        elif not stack:
+            return res
+        else:
+            # res is the result of frame.child
+            frame = stack[-1]
+            child = frame.child
+            if tableau_data.tree is not None:
+                tableau_data.tree.set_status(child.counter, result_status(res))
+            if res:
                 if not child.siblings_imply:
                     if mode == 'complete':
-                        complete_result = True
+                        frame.complete_result = True
                     else: # mode in {'sat', 'strong_sat'}
-                        local_solver.pop()
+                        pop_frame()
+                        frame.local_solver.pop()
+                        res = True
+                        continue
+            elif res is None:
+                frame.max_depth_reached = True
+            elif res_donated:
+                # The donated part of the subtree of child may still have accepting branches
+                frame.donated = True
+                frame.reason = None
+            else:
+                core = child
+                if res_reason is None:
+                    frame.reason = None
+                else:
+                    if frame.reason is not None:
+                        frame.reason |= res_reason
+                    core = conflict_core(child, res_reason)
+                    if not child.siblings_imply:
+                        frame.cores.append((child.current_time, {op.get_formula_id() for op in core.operands}))
+                if child.current_time > frame.node.current_time:
+                    if add_rejected(tableau_data, core) and work_pool is not None:
+                        work_pool.publish_rejected(core)
+                    if child.siblings_imply:
+                        # All other siblings will be rejected
+                        frame.children = iter(())
+
+        if work_pool is not None:
+            for rejected in work_pool.exchange_rejected():
+                add_rejected(tableau_data, rejected)
+            if work_pool.wants_work():
+                donate_child(work_pool, stack)
+        if tableau_data.next_checkpoint is not None and time.perf_counter() >= tableau_data.next_checkpoint:
+            save_checkpoint(tableau_data, stack)
+            tableau_data.next_checkpoint = time.perf_counter() + tableau_data.checkpoint_interval
+        if tableau_data.deadline is not None and tableau_data.deadline.expired():
+            if tableau_data.frontier is not None:
+                # The unexplored part of the tableau goes to the checkpoint saved at the end of the search
+                frontier, accepted = stack_frontier(tableau_data, stack)
+                tableau_data.frontier.extend(frontier)
+                tableau_data.accepted = tableau_data.accepted or accepted
+            return None
+
+        child = frame.next_child()
+        if child is None:
+            pop_frame()
+            res = close_frame(tableau_data, frame)
+            res_donated = frame.donated
+            res_reason = frame.reason
+        else:
+            child_state = None
+            if tableau_data.stutter_jump and child.current_time > frame.node.current_time and child is not frame.stutter_fallback:
+                child_state = time_normalized_state(child)
+                new_child = stutter_jump(child, child_state, branch_states)
+                pending = child_state[3]
+                # If some operand has a far lower bound, new_child may be unsatisfiable even if child is not,
+                # so we explore child if new_child is rejected. This is useless in complete mode,
+                # and simple children must stay the first ones to be explored.
+                if new_child is not child and (not pending or (mode == 'sat' and not child.siblings_imply)):
+                    if pending:
+                        frame.stutter_fallback = child
+                        frame.children = itertools.chain([child], frame.children)
+                    if tableau_data.tree is not None:
+                        add_tree_child(tableau_data, child.counter, new_child)
+                    child = new_child
+                    child_state = None
+            frame.child = child
+            tableau_data.trace = frame.trace
+            # If the child comes from a temporal jump, we need a new, empty solver
+            child_solver = frame.local_solver if child.current_time == frame.node.current_time else frame.local_solver.get_empty_solver()
+            res = open_node(tableau_data, child_solver, child, frame.depth + 1, max_depth)
+            if res is None:
+                record_frontier(tableau_data, stack, child, frame.depth + 1)
+            res_donated = False
+            res_reason = None
+
+class SearchRecord:
+    '''
+    A tableau node expanded by best_first_search, whose children are being explored
+    '''
+    __slots__ = ('node', 'parent', 'depth', 'pending', 'deferred', 'max_depth_reached', 'closed', 'simple_scope')
+
+    def __init__(self, node, parent, depth):
+        self.node = node
+        self.parent = parent # record of the parent of node, None for the root
+        self.depth = depth
+        self.pending = 0 # number of children that are in the queue or whose subtree is being explored
+        self.deferred = [] # children to be scheduled after the simple child has been explored
+        self.max_depth_reached = False
+        self.closed = False
+        # Nearest record of a simple node among self and its ancestors
+        self.simple_scope = self if node.siblings_imply else (parent.simple_scope if parent is not None else None)
+
+    def is_closed(self):
+        '''
+        :return: True if the result for the subtree rooted at self.node is already known
+        '''
+        if self.closed:
+            return True
+        # Records are closed while they still have open descendants only when an accepting branch is found,
+        # and then the search either terminates or stops at the first simple node, so we only check those
+        scope = self.simple_scope
+        while scope is not None:
+            if scope.closed:
+                return True
+            scope = scope.parent.simple_scope
+        return False
+
+def search_priority(node, depth):
+    '''
+    Heuristic used by best_first_search (lower is better):
+    we prefer nodes that reached a later time instant, then deeper nodes
+    (otherwise all nodes of a time instant would be expanded breadth-first),
+    then nodes with fewer obligations (i.e., non-atomic operands) left to decompose,
+    then nodes with fewer real-valued constraints.
+    '''
+    obligations = real_constraints = 0
+    for operand in node.operands:
+        if operand.operator == 'P':
+            real_constraints += operand[0] in {'<', '<=', '>', '>=', '==', '!='}
+        elif operand.operator == '!':
+            real_constraints += operand[0][0] in {'<', '<=', '>', '>=', '==', '!='}
+        else:
+            obligations += 1
+    return (-node.current_time, -depth, obligations, real_constraints)
+
+def best_first_search(tableau_data, root, max_depth):
+    '''
+    Explores the tableau rooted at root keeping all open nodes in a global priority queue,
+    and always expanding the one with the best search_priority.
+    With the beam scheduler, only the best tableau_data.beam_width open nodes are kept:
+    the subtrees of discarded nodes count as unknown, as if they had reached max_depth.
+    Only for modes 'sat' and 'strong_sat'.
+    :return: the result for the tableau rooted at root (see build_decomposition_tree)
+    '''
+    mode = tableau_data.mode
+    beam_width = tableau_data.beam_width if tableau_data.scheduler == 'beam' else None
+    local_solver = LocalSolver()
+    # Records whose constraints are in the scopes of local_solver, one scope each
+    solver_path = []
+    queue = []
+    counter = itertools.count()
+    result = None
+
+    def schedule(record, children):
+        if children[0].siblings_imply:
+            # The simple child is explored first, the others only if it is not rejected
+            record.deferred = children[1:]
+            children = children[:1]
+        # Ties are broken in favor of the most recent node, and then of the order given by decompose,
+        # as in depth-first search
+        for child in reversed(children):
+            record.pending += 1
+            heapq.heappush(queue, (search_priority(child, record.depth + 1), -next(counter), child, record))
+
+    def enter(record, time):
+        '''
+        Sets up the scopes of local_solver for decomposing a child of record at the given time:
+        they must contain the constraints of record and its ancestors at the same time
+        '''
+        nonlocal solver_path
+        if solver_path and solver_path[-1] is record and record.node.current_time == time:
+            return
+        path = []
+        while record is not None and record.node.current_time == time:
+            path.append(record)
+            record = record.parent
+        path.reverse()
+        common = 0
+        while common < min(len(path), len(solver_path)) and path[common] is solver_path[common]:
+            common += 1
+        for _ in range(len(solver_path) - common):
+            local_solver.pop()
+        for record in path[common:]:
+            local_solver.push()
+            if tableau_data.tableau_opts['early_local_consistency_check']:
+                local_consistency_check(local_solver, record.node)
+        solver_path = path
+
+    def child_done(record, child, res):
+        '''
+        Propagates the result res for the subtree rooted at child to the record of its parent and its ancestors
+        :return: True if this determines the result of the whole search, which is stored in result
+        '''
+        nonlocal result
+        while not record.closed:
+            if tableau_data.tree is not None:
+                tableau_data.tree.set_status(child.counter, result_status(res))
+            if res:
+                if not child.siblings_imply:
+                    record.closed = True
+                    if record.parent is None:
+                        result = True
                         return True
-            elif child_res is None:
-                max_depth_reached = True
-            elif mode == 'sat' and child.current_time > current_time:
+                    record, child = record.parent, record.node
+                    continue
+            elif res is None:
+                record.max_depth_reached = True
+            elif child.current_time > record.node.current_time:
                 add_rejected(tableau_data, child)
                 if child.siblings_imply:
                     # All other siblings will be rejected
-                    break
-
-    local_solver.pop()
+                    record.deferred = []
+            if child.siblings_imply and record.deferred:
+                schedule(record, record.deferred)
+            record.pending -= 1
+            if record.pending > 0:
+                return False
+            record.closed = True
+            res = None if record.max_depth_reached else False
+            if record.parent is None:
+                result = res
+                return True
+            record, child = record.parent, record.node
+        return False
 
-    if mode in {'sat', 'strong_sat'}:
-        if max_depth_reached:
-            return None
+    local_solver.push()
+    children = expand_node(tableau_data, local_solver, root, 0, max_depth)
+    if not isinstance(children, list):
+        return children
+    if not children:
         return False
-    else: # mode == 'complete'
-        if not complete_result and max_depth_reached:
+    solver_path.append(SearchRecord(root, None, 0))
+    schedule(solver_path[-1], children)
+
+    while queue:
+        if tableau_data.deadline is not None and tableau_data.deadline.expired():
             return None
-        return complete_result
+        _, _, node, record = heapq.heappop(queue)
+        if record.is_closed():
+            continue
+        enter(record, node.current_time)
+        local_solver.push()
+        children = expand_node(tableau_data, local_solver, node, record.depth + 1, max_depth)
+        if isinstance(children, list) and children:
+            # The new scope of local_solver now belongs to the record of node
+            solver_path.append(SearchRecord(node, record, record.depth + 1))
+            schedule(solver_path[-1], children)
+            if beam_width is not None and len(queue) > beam_width:
+                queue.sort()
+                discarded = queue[beam_width:]
+                del queue[beam_width:]
+                for _, _, node, record in discarded:
+                    if not record.is_closed() and child_done(record, node, None):
+                        return result
+        else:
+            local_solver.pop()
+            if child_done(record, node, False if isinstance(children, list) else children):
+                return result
+    return result
 
 def build_decomposition_tree(tableau_data, root, max_depth):
     """
@@ -1132,46 +1723,97 @@ def build_decomposition_tree(tableau_data, root, max_depth):
     root.jump1 = root.check_boolean_closure(lambda n: n.operator == 'P')
 
     if tableau_data.build_tree:
-        root.counter = tableau_data.counter
-        tableau_data.tree.add_node(root.to_label())
+        tableau_data.tree.add(root)
 
     if tableau_data.verbose:
         print(root)
 
-    res = add_children(tableau_data, LocalSolver(), root, 0, 0, max_depth, root.current_time)
+    if tableau_data.parallel and tableau_data.mode != 'complete':
+        num_workers = None if tableau_data.parallel is True else tableau_data.parallel
+        res = parallel_search(add_children, tableau_data, root, max_depth, num_workers)
+    elif tableau_data.scheduler == 'dfs' or tableau_data.mode == 'complete':
+        res = add_children(tableau_data, LocalSolver(), root, 0, max_depth)
+    else:
+        res = best_first_search(tableau_data, root, max_depth)
+
+    if tableau_data.build_tree:
+        tableau_data.tree.set_status(root.counter, result_status(res))
+    return finish_search(tableau_data, res)
 
+def finish_search(tableau_data, res):
+    '''
+    Saves a checkpoint if the result is unknown and prints statistics
+    :return: the result of build_decomposition_tree
+    '''
+    if tableau_data.checkpoint is not None and res is None:
+        save_checkpoint(tableau_data)
+    deadline = tableau_data.deadline
+    if deadline is not None and res is None and deadline.expired():
+        deadline.statistics.update({
+            'expanded_nodes': tableau_data.expanded_nodes,
+            'rejected_nodes': len(tableau_data.rejected_store),
+            'elapsed_time': time.perf_counter() - tableau_data.start_time
+        })
+        if tableau_data.verbose:
+            print('Deadline expired')
+    trace = trace_segments(tableau_data.witness) if tableau_data.return_trace and res else []
     if tableau_data.verbose:
+        print(f'Expanded {tableau_data.expanded_nodes} tableau nodes')
+        if tableau_data.tableau_opts['memoization'] and not tableau_data.parallel:
+            store = tableau_data.rejected_store
+            print(f'Rejected store: {len(store)} entries, {store.lookups} lookups, {store.hits} hits, {store.evictions} evictions')
         if res:
             print("The requirement set is consistent")
-            if tableau_data.trace_stack is not None:
-                print(f"A trace satisfying the requirements is: " + str([item for sublist in tableau_data.trace_stack for item in sublist]))
+            if tableau_data.return_trace:
+                print("A trace satisfying the requirements is:\n" + format_trace(trace))
         else:
             print("The requirement set is not consistent")
-    if tableau_data.build_tree or tableau_data.trace_stack is not None:
-        return tableau_data.tree, tableau_data.trace_stack, res
+    if tableau_data.build_tree or tableau_data.return_trace:
+        return tableau_data.tree, trace, res
     else:
         return res
 
 class TableauData:
 
-    def __init__(self, number_of_implications, mode, build_tree, return_trace, parallel, verbose, tableau_opts):
+    def __init__(self, number_of_implications, mode, build_tree, return_trace, parallel, verbose, tableau_opts, scheduler='dfs', beam_width=None, memo_max_entries=None, memo_eviction='lru', checkpoint=None, checkpoint_interval=None, deadline=None):
         self.number_of_implications = number_of_implications
         self.build_tree = build_tree
         self.mode = mode
         self.parallel = parallel
         self.verbose = verbose
         if build_tree:
-            self.counter = 0
-            self.tree = nx.DiGraph()
+            # build_tree may be a TreeRecorder streaming the tree to a file
+            self.tree = build_tree if isinstance(build_tree, TreeRecorder) else TreeRecorder()
         else:
             self.tree = None
-        self.trace_stack = [] if return_trace else None
-        if mode == 'sat':
-            self.rejected_store = []
+        self.return_trace = return_trace
+        # Linked traces (see stl_consistency.trace) of the branch being explored and of the last accepting branch
+        self.trace = None
+        self.witness = None
+        self.rejected_store = TrieRejectedStore(memo_max_entries, memo_eviction, track_implications=mode == 'strong_sat')
         self.tableau_opts = tableau_opts
+        # Rejections in strong_sat mode also depend on the implications satisfied in the branch, not only on literals
+        self.conflict_learning = tableau_opts['conflict_learning'] and mode != 'strong_sat'
+        # Traces do not contain the time instants skipped by stutter_jump,
+        # and in strong_sat mode the skipped instants may satisfy implications
+        self.stutter_jump = tableau_opts['stutter_jump'] and mode != 'strong_sat' and not return_trace
+        self.scheduler = scheduler
+        self.beam_width = beam_width
+        self.expanded_nodes = 0
+        # Path to which a Checkpoint is saved, with the nodes that reached the depth limit
+        self.checkpoint = checkpoint
+        self.frontier = [] if checkpoint is not None else None
+        self.checkpoint_interval = checkpoint_interval
+        self.next_checkpoint = time.perf_counter() + checkpoint_interval if checkpoint is not None and checkpoint_interval is not None else None
+        self.pending = [] # frontier of the resumed checkpoint still to be explored, in reverse order
+        self.accepted = False # True if an accepting branch has already been found in 'complete' mode
+        self.deadline = deadline # Deadline after which the search gives up, or None
+        self.start_time = time.perf_counter()
 
 
 def plot_tree(G):
+    if isinstance(G, TreeRecorder):
+        G = G.to_networkx()
     pos = graphviz_layout(G, prog='dot')
     plt.figure(figsize=(12, 8))
     nx.draw(G, pos, with_labels=True, arrows=True, node_size=2000, node_color='lightblue',
@@ -1186,11 +1828,44 @@ default_tableau_opts = {
     'children_order_opts': True,
     'early_local_consistency_check': True,
     'memoization': True,
+    'conflict_learning': True,
+    'stutter_jump': True,
     'simple_nodes_first': True,
     'g_f': True
 }
 
-def make_tableau(formula, max_depth, mode, build_tree, return_trace, parallel, verbose, mltl=False, tableau_opts=default_tableau_opts):
+def make_tableau(formula, max_depth, mode, build_tree, return_trace, parallel, verbose, mltl=False, tableau_opts=default_tableau_opts, scheduler='dfs', beam_width=100, memo_max_entries=None, memo_eviction='lru', lemma_cache=None, checkpoint=None, checkpoint_interval=None, deadline=None):
+    '''
+    :param build_tree: True to record the tableau tree in memory, or a TreeRecorder (e.g., streaming it to a file).
+                       The recorder is returned together with the trace and the result
+    :param parallel: False, True to explore the tableau with one worker process per core,
+                     or the number of worker processes (ignored in 'complete' mode)
+    :param scheduler: order in which tableau nodes are explored:
+                      'dfs' (depth-first), 'best-first' (see best_first_search),
+                      or 'beam' (best-first keeping at most beam_width open nodes).
+                      The whole tableau is explored in 'complete' mode, so 'dfs' is always used there.
+    :param memo_max_entries: maximum number of rejected nodes kept for memoization (None for no limit)
+    :param memo_eviction: policy for choosing which rejected node to drop when memo_max_entries is reached:
+                          'lru', 'lfu' or 'most-specific' (see TrieRejectedStore)
+    :param lemma_cache: path of a file in which rejected nodes are saved to be reused in later runs (see LemmaCache),
+                        or None. Only used with memoization enabled; nodes rejected in 'strong_sat' mode are not saved,
+                        and the parallel tableau reads the cache, but does not update it.
+    :param checkpoint: path of a file to which the part of the search still to be explored is saved
+                       if max_depth is reached (see Checkpoint), so that it can be continued by resume_tableau, or None
+    :param checkpoint_interval: if not None, the checkpoint is also saved every checkpoint_interval seconds during the search
+    :param deadline: Deadline after which the search gives up and returns None (as if max_depth was reached,
+                     so the unexplored part of the tableau is saved to checkpoint), or None
+    '''
+    if scheduler not in {'dfs', 'best-first', 'beam'}:
+        raise ValueError(f'Unknown scheduler: {scheduler}')
+    if scheduler != 'dfs' and return_trace:
+        raise ValueError('Traces can only be computed with the dfs scheduler')
+    if parallel and (scheduler != 'dfs' or build_tree or return_trace):
+        raise ValueError('The parallel tableau only supports the dfs scheduler, and cannot build the tree or return traces')
+    if checkpoint is not None and ((scheduler != 'dfs' and mode != 'complete') or (parallel and mode != 'complete')):
+        raise ValueError('Checkpoints can only be saved with the sequential dfs scheduler')
+    start_t = time.perf_counter()
+    clear_formula_tables(formula)
     if formula.operator != ',':
         formula = Node(',', formula)
 
@@ -1206,10 +1881,68 @@ def make_tableau(formula, max_depth, mode, build_tree, return_trace, parallel, v
     assign_and_or_element(formula)
     number_of_implications = count_implications(formula)
     formula.set_initial_time()
+    assign_id_t = time.perf_counter()
     assign_identifier(formula)
+    preprocessing_t = time.perf_counter()
+    if verbose:
+        print(f'Preprocessing time: {preprocessing_t - start_t} (identifier assignment: {preprocessing_t - assign_id_t})')
+
+    tableau_data = TableauData(number_of_implications, mode, build_tree, return_trace, parallel, verbose, tableau_opts, scheduler, beam_width, memo_max_entries, memo_eviction, checkpoint, checkpoint_interval, deadline)
+    if lemma_cache is not None and tableau_opts['memoization']:
+        cache = LemmaCache(lemma_cache, mltl)
+        loaded = cache.load(tableau_data.rejected_store, formula)
+        if verbose:
+            print(f'Loaded {loaded} rejected nodes from {lemma_cache}')
+    else:
+        cache = None
+    res = build_decomposition_tree(tableau_data, formula, max_depth)
+    if verbose:
+        print(f'Tableau construction time: {time.perf_counter() - preprocessing_t}')
+    if cache is not None:
+        if not parallel:
+            saved = cache.save(tableau_data.rejected_store)
+            if verbose:
+                print(f'Saved {saved} rejected nodes to {lemma_cache}')
+        cache.close()
+    return res
 
-    tableau_data = TableauData(number_of_implications, mode, build_tree, return_trace, parallel, verbose, tableau_opts)
-    return build_decomposition_tree(tableau_data, formula, max_depth)
-
-
-
+def resume_tableau(checkpoint, max_depth, verbose=False, save_checkpoint_to=None, checkpoint_interval=None, deadline=None):
+    '''
+    Continues the search saved in a Checkpoint by make_tableau, with the same mode and options.
+    :param checkpoint: path of the checkpoint file
+    :param max_depth: new depth limit, which applies to the depth of the nodes in the whole tableau
+    :param save_checkpoint_to, checkpoint_interval, deadline: same as checkpoint, checkpoint_interval and deadline
+                                                              in make_tableau (save_checkpoint_to may be the same file as checkpoint)
+    :return: the same as make_tableau, with None as the tableau, which is not built
+    '''
+    clear_formula_tables()
+    saved = load_checkpoint(checkpoint)
+    tableau_data = TableauData(
+        saved.number_of_implications, saved.mode, False, saved.traces, False, verbose, saved.tableau_opts,
+        memo_max_entries=saved.memo_max_entries, memo_eviction=saved.memo_eviction,
+        checkpoint=save_checkpoint_to, checkpoint_interval=checkpoint_interval, deadline=deadline
+    )
+    tableau_data.rejected_store.import_entries(saved.rejected)
+    tableau_data.expanded_nodes = saved.expanded_nodes
+    tableau_data.accepted = saved.accepted
+    tableau_data.pending = saved.frontier[::-1]
+    if verbose:
+        print(f'Resuming {len(saved.frontier)} frontier nodes and {len(saved.rejected)} rejected nodes from {checkpoint}')
+
+    res = False
+    while tableau_data.pending:
+        if deadline is not None and deadline.expired():
+            res = None
+            break
+        node, depth, tableau_data.trace = tableau_data.pending.pop()
+        node_res = add_children(tableau_data, LocalSolver(), node, depth, max_depth)
+        if node_res:
+            res = True
+            if saved.mode != 'complete':
+                break
+            tableau_data.accepted = True
+        elif node_res is None and res is False:
+            res = None
+    if saved.accepted:
+        res = True
+    return finish_search(tableau_data, res)
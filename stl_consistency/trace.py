@@ -0,0 +1,75 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Traces computed by the tableau are run-length encoded: they are lists of segments (start, end, literals),
+# meaning that the literals (strings such as 'B_a' or '! (x > 3)') hold at all time instants in [start, end).
+# The tableau jumps over many time instants at once, so the length of a trace is proportional
+# to the number of jumps in the branch, and not to the time horizon.
+# While the tableau is explored, the trace of the current branch is a linked list from its last segment
+# to the first one: None is the empty trace, and (segment, trace) extends trace with segment.
+# Branches share the trace of their common prefix, so backtracking only needs to restore a previous trace.
+
+def extend_trace(trace, start, end, literals):
+    '''
+    :return: trace extended with the segment in which literals hold from start to end (excluded),
+             merged with the last one if it continues it with the same literals
+    '''
+    literals = tuple(sorted(set(literals)))
+    if trace is not None:
+        (last_start, last_end, last_literals), previous = trace
+        if last_end == start and last_literals == literals:
+            return (last_start, end, literals), previous
+    return (start, end, literals), trace
+
+def trace_segments(trace):
+    '''
+    :return: the list of the segments of the linked trace, in time order
+    '''
+    segments = []
+    while trace is not None:
+        segment, trace = trace
+        segments.append(segment)
+    segments.reverse()
+    return segments
+
+def expand_trace(trace):
+    '''
+    :return: the list of the literals holding at each time instant from 0 to the end of trace
+    '''
+    instants = []
+    for start, end, literals in trace:
+        if start > len(instants):
+            # Instants skipped by the tableau are not constrained
+            instants.extend([] for _ in range(start - len(instants)))
+        instants.extend(list(literals) for _ in range(end - start))
+    return instants
+
+def format_trace(trace):
+    '''
+    :return: a string with one line for each segment of trace
+    '''
+    lines = []
+    for start, end, literals in trace:
+        interval = f'{start}' if end == start + 1 else f'[{start}, {end - 1}]'
+        lines.append(f'{interval}: {", ".join(literals)}')
+    return '\n'.join(lines)
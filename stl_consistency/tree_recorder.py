@@ -0,0 +1,173 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import json
+import random
+from array import array
+import networkx as nx
+
+OPEN = 0
+ACCEPTED = 1
+REJECTED = 2
+UNKNOWN = 3 # the depth limit has been reached in the subtree
+STATUS_NAMES = ('open', 'accepted', 'rejected', 'unknown')
+STATUS_COLORS = ('black', 'green', 'red', 'orange')
+
+def result_status(res):
+    '''
+    :return: the status of a tableau node whose subtree has result res (see build_decomposition_tree)
+    '''
+    if res is None:
+        return UNKNOWN
+    return ACCEPTED if res else REJECTED
+
+class TreeRecorder:
+    '''
+    Records the tableau tree built by the search, storing only the parent, depth and status of each node
+    in compact arrays indexed by node id (node ids are given in creation order, starting from 0 for the root).
+    If a path is given, nodes are streamed to it as they are created, in DOT or JSON lines format,
+    and their statuses are added when the results of their subtrees are known.
+    Node labels (see Node.to_label) are only rendered for the nodes that are written,
+    which can be restricted to a subtree, a maximum depth, or a random sample of the subtrees.
+    Without a path, the labels of the written nodes are kept in memory, and the tree can be exported by to_networkx.
+    '''
+
+    def __init__(self, path=None, output_format=None, max_depth=None, subtree=None, sample=None, seed=0, labels=True):
+        '''
+        :param path: file to which nodes are written, or None to keep them in memory
+        :param output_format: 'dot' or 'jsonl' (default: 'jsonl' if path ends with .jsonl or .json, 'dot' otherwise)
+        :param max_depth: nodes deeper than max_depth (counting from the root of subtree, if given) are not written
+        :param subtree: if not None, only the subtree rooted at the node with this id is written
+        :param sample: if not None, each subtree is written with this probability (the root of the output always is)
+        :param seed: seed of the random sampling
+        :param labels: if False, nodes are written without labels
+        '''
+        if output_format is None:
+            output_format = 'jsonl' if path is not None and path.endswith(('.jsonl', '.json')) else 'dot'
+        if output_format not in {'dot', 'jsonl'}:
+            raise ValueError(f'Unknown tree output format {output_format}')
+        self.output_format = output_format
+        self.max_depth = max_depth
+        self.subtree = subtree
+        self.sample = sample
+        self.random = random.Random(seed)
+        self.labels = labels
+        self.parents = array('q') # -1 for the root
+        self.depths = array('L') # depth from the root of the written tree
+        self.statuses = bytearray()
+        self.written = bytearray() # 1 if the node is written
+        self.node_labels = {} # labels of written nodes, if there is no path
+        self.file = None
+        if path is not None:
+            self.file = open(path, 'w')
+            if output_format == 'dot':
+                self.file.write('digraph tableau {\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            if self.output_format == 'dot':
+                self.file.write('}\n')
+            self.file.close()
+            self.file = None
+
+    def add(self, node, parent=None):
+        '''
+        Records a new tableau node.
+        :param node: a Node, whose counter is set to the new id, or a string labelling a leaf (e.g. 'Rejected')
+        :param parent: id of the parent node, or None for the root
+        :return: the id of the new node
+        '''
+        node_id = len(self.parents)
+        if parent is None or node_id == self.subtree:
+            depth = 0
+            write = self.subtree is None or node_id == self.subtree
+        else:
+            depth = self.depths[parent] + 1
+            write = (self.written[parent] and (self.max_depth is None or depth <= self.max_depth)
+                     and (self.sample is None or self.random.random() < self.sample))
+        self.parents.append(-1 if parent is None else parent)
+        self.depths.append(depth)
+        self.statuses.append(OPEN)
+        self.written.append(write)
+        if isinstance(node, str):
+            label = f'{node} {node_id}' if self.labels else None
+            time = None
+        else:
+            node.counter = node_id
+            label = None
+            time = node.current_time
+        if write:
+            if self.labels and label is None:
+                label = node.to_label()
+            self.write_node(node_id, parent if depth > 0 else None, time, label)
+        return node_id
+
+    def set_status(self, node_id, status):
+        '''
+        :param status: one of OPEN, ACCEPTED, REJECTED, UNKNOWN
+        '''
+        self.statuses[node_id] = status
+        if self.file is not None and self.written[node_id]:
+            if self.output_format == 'dot':
+                self.file.write(f'n{node_id} [status="{STATUS_NAMES[status]}", color="{STATUS_COLORS[status]}"];\n')
+            else:
+                self.file.write(json.dumps({'id': node_id, 'status': STATUS_NAMES[status]}) + '\n')
+
+    def write_node(self, node_id, parent, time, label):
+        if self.file is None:
+            if label is not None:
+                self.node_labels[node_id] = label
+        elif self.output_format == 'dot':
+            if label is not None:
+                escaped = label.replace('\\', '\\\\').replace('"', '\\"')
+                self.file.write(f'n{node_id} [label="{escaped}"];\n')
+            else:
+                self.file.write(f'n{node_id};\n')
+            if parent is not None:
+                self.file.write(f'n{parent} -> n{node_id};\n')
+        else:
+            record = {'id': node_id, 'parent': parent, 'time': time}
+            if label is not None:
+                record['label'] = label
+            self.file.write(json.dumps(record) + '\n')
+
+    def to_networkx(self):
+        '''
+        :return: a networkx.DiGraph with the written nodes, labelled by their label (or id), with a status attribute
+        '''
+        G = nx.DiGraph()
+        names = {}
+        for node_id in range(len(self.parents)):
+            if self.written[node_id]:
+                names[node_id] = self.node_labels.get(node_id, str(node_id))
+                G.add_node(names[node_id], status=STATUS_NAMES[self.statuses[node_id]])
+                if self.depths[node_id] > 0:
+                    G.add_edge(names[self.parents[node_id]], names[node_id])
+        return G
@@ -25,11 +25,14 @@
 import argparse
 import sys
 import time
-import networkx
 
 from stl_consistency.parser import STLParser
 from stl_consistency.smtchecker import smt_check_consistency
-from stl_consistency.tableau import make_tableau, plot_tree
+from stl_consistency.tableau import make_tableau, resume_tableau, plot_tree
+from stl_consistency.portfolio import portfolio_check, tableau_portfolio_check
+from stl_consistency.deadline import Deadline
+from stl_consistency.trace import format_trace
+from stl_consistency.tree_recorder import TreeRecorder
 
 def read_formula(filename):
     with open(filename, 'rt') as f:
@@ -41,76 +44,153 @@ def main():
     argp = argparse.ArgumentParser()
     argp.add_argument('-s', '--smt', action='store_true', help='Use SMT-based bounded satisfiability checker instead of tree-based tableau (default)')
     argp.add_argument('-d', '--max-depth', type=int, default=DEFAULT_DEPTH, help='Build tableau up to the given depth (ignored if --smt is given)')
-    argp.add_argument('-p', '--plot', type=str, help='Plot the tree-shaped tableau to the given dot file (ignored if --smt is given)')
+    argp.add_argument('-p', '--plot', type=str, help='Plot the tree-shaped tableau to the given dot file, or JSON lines file if it ends with .jsonl (ignored if --smt is given)')
+    argp.add_argument('--plot-max-depth', type=int, metavar='DEPTH', help='Only plot tableau nodes up to the given depth')
+    argp.add_argument('--plot-subtree', type=int, metavar='ID', help='Only plot the subtree of the tableau rooted at the node with the given id')
+    argp.add_argument('--plot-sample', type=float, metavar='P', help='Plot each subtree of the tableau with probability P')
+    argp.add_argument('--plot-no-labels', action='store_true', help='Plot tableau nodes without their formulas')
     argp.add_argument('--print-trace', action='store_true', help='Print an example trace that satisfies the formula)')
     argp.add_argument('-t', '--strong-sat', action='store_true', help='Use strong definition of satisfiability that avoids formulas being satisfied vacuously (default is normal satisfiability)')
+    argp.add_argument('--portfolio', action='store_true', help='Run the tableau and the SMT-based checker in parallel, and return the result of the fastest one')
+    argp.add_argument('--tableau-portfolio', nargs='?', type=int, const=True, default=False, metavar='CONFIGS', help='Run the given number of tableau configurations in parallel (default: one per core), and return the result of the fastest one. The --no-* tableau options are ignored')
     argp.add_argument('--smtlib-result', action='store_true', help='Emit result as SMTLIB output (sat, unsat, unknown)')
-    argp.add_argument('--parallel', action='store_true', help='Use parallel version of the tableau')
+    argp.add_argument('--parallel', nargs='?', type=int, const=True, default=False, metavar='WORKERS', help='Use parallel version of the tableau with the given number of worker processes (default: one per core)')
+    argp.add_argument('--scheduler', choices=['dfs', 'best-first', 'beam'], default='dfs', help='Order in which tableau nodes are explored (default: dfs)')
+    argp.add_argument('--beam-width', type=int, default=100, help='Maximum number of open tableau nodes kept by the beam scheduler (default: 100)')
+    argp.add_argument('--memo-max-entries', type=int, help='Maximum number of rejected nodes kept for memoization in the tableau (default: no limit)')
+    argp.add_argument('--memo-eviction', choices=['lru', 'lfu', 'most-specific'], default='lru', help='Which rejected node to drop when --memo-max-entries is reached: least recently used, least frequently used, or the one with most operands (default: lru)')
+    argp.add_argument('--lemma-cache', type=str, metavar='FILE', help='Reuse the rejected tableau nodes saved in the given file by previous runs, and save new ones to it')
+    argp.add_argument('--timeout', type=float, metavar='SECONDS', help='Give up and answer unknown after the given number of seconds (the tableau search done so far is saved if --checkpoint is given)')
+    argp.add_argument('--checkpoint', type=str, metavar='FILE', help='If the depth limit is reached, save the part of the tableau still to be explored to the given file, so that it can be continued with --resume')
+    argp.add_argument('--checkpoint-interval', type=float, metavar='SECONDS', help='Also save the checkpoint every given number of seconds during the search (requires --checkpoint)')
+    argp.add_argument('--resume', type=str, metavar='FILE', help='Continue the tableau search saved in the given checkpoint file with the depth limit given by -d, instead of checking a formula. Mode and tableau options are those of the saved search')
     argp.add_argument('--mltl', action='store_true', help='Use MLTL semantics for U and R operators.') # TODO support this in SMT engine
     argp.add_argument('--no-jump', action='store_true', help='Disable jump rule in tableau.')
     argp.add_argument('--no-formula-optimizations', action='store_true', help='Disable formula optimizations in tableau.')
     argp.add_argument('--no-children-order-optimizations', action='store_true', help='Disable children order optimizations in tableau.')
     argp.add_argument('--no-early-local-consistency-check', action='store_true', help='Perform local consistency checks on poised tableau nodes only.')
     argp.add_argument('--no-memoization', action='store_true', help='Disable memoization of tableau nodes.')
+    argp.add_argument('--no-conflict-learning', action='store_true', help='Do not learn conflict cores of rejected tableau nodes nor backjump over their siblings.')
+    argp.add_argument('--no-stutter-jump', action='store_true', help='Do not skip repetitions of time-normalized tableau states along a branch.')
     argp.add_argument('--no-simple-nodes', action='store_true', help='Disable simple nodes optimization in tableau.')
     argp.add_argument('--no-g-f', action='store_true', help='Do not use special rules for G and F in the tableau.')
     argp.add_argument('-v', '--verbose', action='store_true')
-    argp.add_argument('formula', type=str, help='File containing formula to be checked.')
+    argp.add_argument('formula', type=str, nargs='?', help='File containing formula to be checked.')
     args = argp.parse_args()
-
+    # The defaults are booleans, and explicit values of 0 would be taken as the options not being given
+    if type(args.tableau_portfolio) is int and args.tableau_portfolio < 1:
+        argp.error('--tableau-portfolio must be at least 1')
+    if type(args.parallel) is int and args.parallel < 1:
+        argp.error('--parallel must be at least 1')
+    if (args.formula is None) == (args.resume is None):
+        argp.error('either a formula or --resume must be given')
+    if args.checkpoint_interval is not None and args.checkpoint is None:
+        argp.error('--checkpoint-interval requires --checkpoint')
+    if (args.checkpoint or args.resume) and (args.smt or args.portfolio or args.tableau_portfolio or args.parallel or args.scheduler != 'dfs'):
+        argp.error('--checkpoint and --resume can only be used with the sequential dfs tableau')
+    if (args.plot_max_depth is not None or args.plot_subtree is not None or args.plot_sample is not None or args.plot_no_labels) and not args.plot:
+        argp.error('--plot-max-depth, --plot-subtree, --plot-sample and --plot-no-labels require --plot')
+    if args.plot_sample is not None and not 0 < args.plot_sample <= 1:
+        argp.error('--plot-sample must be in (0, 1]')
+    if args.resume and args.plot:
+        argp.error('--resume cannot be used with --plot')
+    if args.portfolio and (args.smt or args.plot or args.print_trace):
+        argp.error('--portfolio cannot be used with --smt, --plot or --print-trace')
+    if args.tableau_portfolio and (args.portfolio or args.smt or args.plot or args.print_trace):
+        argp.error('--tableau-portfolio cannot be used with --portfolio, --smt, --plot or --print-trace')
+
+    # The tableau search is iterative, but parsing and formula preprocessing
+    # still recurse on the nesting depth of the input formula
     sys.setrecursionlimit(100000000)
 
-    formula = read_formula(args.formula)
     parser = STLParser()
+    deadline = Deadline(args.timeout) if args.timeout is not None else None
 
     mode = 'strong_sat' if args.strong_sat else 'sat'
 
-    if args.smt:
+    tableau_opts = {
+        'jump': not args.no_jump,
+        'formula_opts': not args.no_formula_optimizations,
+        'children_order_opts': not args.no_children_order_optimizations,
+        'early_local_consistency_check': not args.no_early_local_consistency_check,
+        'memoization': not args.no_memoization,
+        'conflict_learning': not args.no_conflict_learning,
+        'stutter_jump': not args.no_stutter_jump,
+        'simple_nodes_first': not args.no_simple_nodes,
+        'g_f': not args.no_g_f
+    }
+
+    if args.resume:
+        start_t = parsing_t = time.perf_counter()
+        res = resume_tableau(args.resume, args.max_depth, args.verbose, args.checkpoint, args.checkpoint_interval, deadline)
+        if isinstance(res, tuple):
+            _, trace, res = res
+            if args.print_trace and res:
+                print('Trace:')
+                print(format_trace(trace))
+    elif args.portfolio:
+        formula = read_formula(args.formula)
+        start_t = time.perf_counter()
+        parsed_formula = parser.parse_formula_as_stl_list(formula)
+        parsing_t = time.perf_counter()
+        res = portfolio_check(parsed_formula, args.max_depth, mode, args.mltl, tableau_opts, args.verbose, args.timeout)
+    elif args.tableau_portfolio:
+        formula = read_formula(args.formula)
         start_t = time.perf_counter()
         parsed_formula = parser.parse_formula_as_stl_list(formula)
         parsing_t = time.perf_counter()
-        res = smt_check_consistency(parsed_formula, mode, args.print_trace, args.verbose)
+        num_configurations = None if args.tableau_portfolio is True else args.tableau_portfolio
+        res = tableau_portfolio_check(parsed_formula, args.max_depth, mode, args.mltl, num_configurations=num_configurations, verbose=args.verbose, timeout=args.timeout)
+    elif args.smt:
+        formula = read_formula(args.formula)
+        start_t = time.perf_counter()
+        parsed_formula = parser.parse_formula_as_stl_list(formula)
+        parsing_t = time.perf_counter()
+        res = smt_check_consistency(parsed_formula, mode, args.print_trace, args.verbose, deadline)
 
-        if args.print_trace:
+        if isinstance(res, tuple):
+            # Only consistent formulas come with a trace
             trace, res = res
             if res:
                 print('Trace:')
                 print(trace)
     else:
+        formula = read_formula(args.formula)
         start_t = time.perf_counter()
 
         parsed_formula = parser.parse_formula_as_node(formula)
         parsing_t = time.perf_counter()
 
-        tableau_opts = {
-            'jump': not args.no_jump,
-            'formula_opts': not args.no_formula_optimizations,
-            'children_order_opts': not args.no_children_order_optimizations,
-            'early_local_consistency_check': not args.no_early_local_consistency_check,
-            'memoization': not args.no_memoization,
-            'simple_nodes_first': not args.no_simple_nodes,
-            'g_f': not args.no_g_f
-        }
-
+        tree = False
+        if args.plot:
+            tree = TreeRecorder(args.plot, max_depth=args.plot_max_depth, subtree=args.plot_subtree, sample=args.plot_sample, labels=not args.plot_no_labels)
         res = make_tableau(
             parsed_formula,
             args.max_depth,
             mode,
-            build_tree=args.plot is not None,
+            build_tree=tree,
             return_trace=args.print_trace,
             parallel=args.parallel,
             verbose=args.verbose,
             mltl=args.mltl,
-            tableau_opts=tableau_opts
+            tableau_opts=tableau_opts,
+            scheduler=args.scheduler,
+            beam_width=args.beam_width,
+            memo_max_entries=args.memo_max_entries,
+            memo_eviction=args.memo_eviction,
+            lemma_cache=args.lemma_cache,
+            checkpoint=args.checkpoint,
+            checkpoint_interval=args.checkpoint_interval,
+            deadline=deadline
         )
 
         if args.plot or args.print_trace:
-            tree, trace, res = res
+            _, trace, res = res
             if args.plot:
-                networkx.drawing.nx_pydot.write_dot(tree, args.plot)
+                tree.close()
             if args.print_trace and res:
                     print('Trace:')
-                    print(trace)
+                    print(format_trace(trace))
 
     if args.smtlib_result:
         if res:
@@ -123,6 +203,12 @@ def main():
         print(f'Elapsed time: {time.perf_counter() - parsing_t} (parsing: {parsing_t - start_t})')
         if res:
             print('The constraints are consistent.')
+        elif res is None and deadline is not None and deadline.expired():
+            print(f'Consistency could not be determined within the time limit of {args.timeout} seconds.' + (f' The search has been saved to {args.checkpoint}.' if args.checkpoint else ''))
+            if args.verbose:
+                print(f'Statistics: {deadline.statistics}')
+        elif res is None and args.checkpoint:
+            print(f'Consistency could not be proved within the given depth limit. The search has been saved to {args.checkpoint}: continue it with --resume {args.checkpoint} and a larger -d.')
         elif res is None:
             print('Consistency could not be proved within the given depth limit. Please increase it with the -d option.')
         else:
@@ -0,0 +1,242 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import tempfile
+import unittest
+
+from stl_consistency.node import Node
+from stl_consistency import memo
+from stl_consistency.memo import ListRejectedStore, TrieRejectedStore, LemmaCache
+from stl_consistency.parser import STLParser
+from stl_consistency.tableau import make_tableau, default_tableau_opts, formula_horizons
+
+class TestMemo(unittest.TestCase):
+
+    def make_node(self, formula, current_time=0):
+        node = Node(*formula)
+        node.current_time = current_time
+        node.sort_operands()
+        return node
+
+    def test_formula_ids(self):
+        node1 = Node(',', ['G', '0', '10', ['&&', ['a'], ['b']]], ['F', '2', '5', ['c']])
+        node2 = Node(',', ['G', '0', '10', ['&&', ['a'], ['b']]], ['F', '2', '5', ['c']])
+        self.assertEqual(node1.get_formula_id(), node2.get_formula_id())
+        self.assertEqual(node1[0].get_formula_id(), node2[0].get_formula_id())
+        self.assertNotEqual(node1[0].get_formula_id(), node1[1].get_formula_id())
+        self.assertNotEqual(Node('G', '0', '11', ['&&', ['a'], ['b']]).get_formula_id(), node1[0].get_formula_id())
+
+    def test_shallow_copy(self):
+        parent = Node(',', ['G', '0', '10', ['a']], ['F', '2', '5', ['b']])
+        parent_id = parent.get_formula_id()
+        operands = list(parent.operands)
+        copy = parent.shallow_copy()
+        self.assertIs(copy.operands, parent.operands)
+        copy.own_operands().append(Node('c'))
+        copy.remove_operand(0)
+        self.assertEqual(parent.operands, operands)
+        self.assertEqual(parent.get_formula_id(), parent_id)
+        self.assertNotEqual(copy.get_formula_id(), parent_id)
+        # Copies of copies do not share the operands of their ancestors either
+        grandchild = copy.shallow_copy()
+        grandchild.own_operands().clear()
+        self.assertEqual(len(copy.operands), 2)
+        self.assertEqual(parent.operands, operands)
+
+    def test_tables_cleared(self):
+        # The tables indexed by formula ids do not grow across tableau runs
+        parser = STLParser()
+        formula = "G[0,10] (a -> F[1,3] b) && G[0,10] (b -> G[1,2] !a) && F[2,8] a"
+        other = "G[0,20] (c -> F[1,5] d) && G[0,20] (d -> G[1,4] !c) && F[5,15] c"
+        sizes = []
+        for f in [formula, other, formula]:
+            self.assertTrue(make_tableau(parser.parse_formula_as_node(f), 1000, 'sat', False, False, False, False))
+            sizes.append((len(Node.unique_table), len(memo.signature_ids), len(memo.formula_symbols), len(formula_horizons)))
+        self.assertEqual(sizes[0], sizes[2])
+
+        # Formulas whose ids were computed in a previous run can be checked again
+        node = parser.parse_formula_as_node(formula)
+        node.get_formula_id()
+        make_tableau(parser.parse_formula_as_node(other), 1000, 'sat', False, False, False, False)
+        self.assertTrue(make_tableau(node, 1000, 'sat', False, False, False, False))
+
+    def test_find_implied(self):
+        rejected = [
+            self.make_node([',', ['G', '0', '10', ['a']], ['F', '2', '5', ['b']]]),
+            self.make_node([',', ['c'], ['G', '0', '3', ['a']]]),
+            self.make_node([',', ['!', ['c']], ['F', '0', '8', ['d']], ['G', '4', '6', ['a']]], 4),
+        ]
+        tests = [
+            ([',', ['G', '0', '12', ['a']], ['F', '3', '4', ['b']], ['d']], 0),
+            ([',', ['G', '0', '12', ['a']], ['F', '1', '4', ['b']]], None),
+            ([',', ['c'], ['G', '0', '2', ['a']]], None),
+            ([',', ['c'], ['G', '0', '3', ['a']], ['F', '0', '1', ['b']]], 1),
+            ([',', ['!', ['c']], ['F', '1', '3', ['d']], ['G', '0', '9', ['a']]], 2),
+            ([',', ['!', ['c']], ['F', '1', '3', ['d']]], None),
+        ]
+        list_store = ListRejectedStore()
+        trie_store = TrieRejectedStore()
+        for node in rejected:
+            list_store.add(node)
+            trie_store.add(node)
+        self.assertEqual(len(trie_store), len(rejected))
+        for formula, expected in tests:
+            with self.subTest(formula=formula):
+                expected = None if expected is None else rejected[expected]
+                self.assertEqual(trie_store.find_implied(self.make_node(formula)) is not None, expected is not None)
+                # The list store may miss some implied nodes, but it never finds wrong ones
+                self.assertIn(list_store.find_implied(self.make_node(formula)), [None, expected])
+
+    def test_implication_rules(self):
+        tests = [
+            ([',', ['U', '0', '5', ['a'], ['b']]], [',', ['U', '0', '3', ['a'], ['b']]], True),
+            ([',', ['G', '0', '2', ['c']], ['U', '0', '5', ['a'], ['b']]], [',', ['G', '0', '2', ['c']], ['U', '1', '3', ['a'], ['b']]], False),
+            ([',', ['U', '0', '5', ['a'], ['b']]], [',', ['U', '0', '7', ['a'], ['b']]], False),
+            ([',', ['R', '0', '5', ['a'], ['b']]], [',', ['R', '0', '8', ['a'], ['b']]], True),
+            ([',', ['R', '0', '5', ['a'], ['b']]], [',', ['R', '0', '3', ['a'], ['b']]], False),
+            ([',', ['G', '0', '5', ['a']]], [',', ['G', '0', '8', ['&&', ['a'], ['b']]]], True),
+            ([',', ['F', '0', '8', ['||', ['a'], ['c']]]], [',', ['F', '2', '4', ['a']]], True),
+            ([',', ['F', '0', '8', ['||', ['a'], ['c']]]], [',', ['F', '2', '4', ['&&', ['a'], ['b']]]], True),
+            ([',', ['F', '0', '8', ['||', ['a'], ['c']]]], [',', ['F', '2', '4', ['b']]], False),
+            ([',', ['G', '0', '5', ['||', ['a'], ['b'], ['c']]]], [',', ['G', '0', '5', ['||', ['a'], ['b']]]], True),
+            ([',', ['G', '0', '5', ['&&', ['a'], ['b']]]], [',', ['G', '0', '5', ['&&', ['a'], ['b'], ['c']]]], True),
+            ([',', ['U', '0', '5', ['a'], ['||', ['b'], ['c']]]], [',', ['U', '0', '5', ['&&', ['a'], ['d']], ['b']]], True),
+            ([',', ['U', '0', '5', ['a'], ['||', ['b'], ['c']]]], [',', ['U', '0', '5', ['d'], ['b']]], False),
+        ]
+        for rejected, query, expected in tests:
+            with self.subTest(rejected=rejected, query=query):
+                rejected, query = self.make_node(rejected), self.make_node(query)
+                store = TrieRejectedStore()
+                store.add(rejected)
+                self.assertEqual(store.find_implied(query) is not None, expected)
+                self.assertEqual(query.implies_quick(rejected), expected)
+
+        pending = Node('O', Node('G', '0', '10', ['a']))
+        self.assertTrue(pending.implies_quick_inner(Node('O', Node('G', '2', '5', ['a'])), 0, 0))
+        self.assertFalse(pending.implies_quick_inner(Node('O', Node('F', '2', '5', ['a'])), 0, 0))
+
+    def test_eviction(self):
+        rejected = [
+            self.make_node([',', ['G', '0', '10', ['e']], ['F', '2', '5', ['b']], ['c']]),
+            self.make_node([',', ['G', '0', '3', ['a']]]),
+            self.make_node([',', ['F', '0', '8', ['d']]]),
+        ]
+        queries = [
+            self.make_node([',', ['G', '0', '10', ['e']], ['F', '3', '4', ['b']], ['c']]),
+            self.make_node([',', ['G', '0', '3', ['a']]]),
+            self.make_node([',', ['F', '1', '3', ['d']]]),
+        ]
+        # The first node is the least recently used, the least frequently used, and the most specific one
+        for policy in ['lru', 'lfu', 'most-specific']:
+            with self.subTest(policy=policy):
+                store = TrieRejectedStore(2, policy)
+                store.add(rejected[0])
+                store.add(rejected[1])
+                self.assertIsNotNone(store.find_implied(queries[1]))
+                store.add(rejected[2])
+                self.assertEqual((len(store), store.hits, store.evictions), (2, 1, 1))
+                self.assertEqual([store.find_implied(query) is not None for query in queries], [False, True, True])
+
+        # The second node has been used less recently than the third one, but more frequently
+        stores = {policy: TrieRejectedStore(2, policy) for policy in ['lru', 'lfu']}
+        for store in stores.values():
+            store.add(rejected[1])
+            store.add(rejected[2])
+            store.find_implied(queries[1])
+            store.find_implied(queries[1])
+            store.find_implied(queries[2])
+            store.add(rejected[0])
+        self.assertEqual([stores['lru'].find_implied(query) is not None for query in queries], [True, False, True])
+        self.assertEqual([stores['lfu'].find_implied(query) is not None for query in queries], [True, True, False])
+
+    def test_strong_sat(self):
+        def make_node(formula, satisfied, implication_ids=None):
+            if implication_ids is None:
+                implication_ids = {'a': 0, 'd': 1}
+            node = self.make_node(formula)
+            node.satisfied_implications = satisfied
+            stack = [node]
+            while stack:
+                n = stack.pop()
+                if n.operator == '->':
+                    n.identifier = implication_ids[n[0][0]]
+                elif n.operator != 'P':
+                    stack.extend(n.operands)
+            return node
+
+        rejected = make_node([',', ['G', '0', '10', ['->', ['a'], ['b']]], ['c']], {1})
+        tests = [
+            (make_node([',', ['G', '0', '10', ['->', ['a'], ['b']]], ['c']], set()), True),
+            # The implication may be satisfied at time instants at which it is not in the rejected node
+            (make_node([',', ['G', '0', '12', ['->', ['a'], ['b']]], ['c']], set()), False),
+            (make_node([',', ['G', '0', '10', ['->', ['a'], ['b']]], ['c']], {2}), False),
+            (make_node([',', ['G', '0', '10', ['->', ['a'], ['b']]], ['c']], set(), {'a': 5}), False),
+            # The implication is already satisfied in the rejected node, so only the bounds matter
+            (make_node([',', ['G', '0', '12', ['->', ['a'], ['b']]], ['c']], set(), {'a': 1}), True),
+            # The additional implication is already satisfied in the rejected node
+            (make_node([',', ['G', '0', '10', ['->', ['a'], ['b']]], ['c'], ['G', '0', '5', ['->', ['d'], ['e']]]], set()), True),
+        ]
+        store = TrieRejectedStore(track_implications=True)
+        store.add(rejected)
+        for query, expected in tests:
+            with self.subTest(query=query):
+                self.assertEqual(store.find_implied(query) is not None, expected)
+
+        parser = STLParser()
+        for formula in [
+            "(!(G[2,3] (a))) -> (!b) && b && (c) U[4,10] (c) && F[4,9] (!c)",
+            "((c) || ((a) && (!c))) && ((((x < 0)) && (b)) || (G[5,11] (d))) && ((d) -> (!d)) U[2,7] (((y - x < 2)) || (!b)) && !(b)",
+            "G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)",
+        ]:
+            for mode in ['strong_sat', 'complete']:
+                with self.subTest(formula=formula, mode=mode):
+                    results = [
+                        make_tableau(parser.parse_formula_as_node(formula), 200, mode, False, False, False, False, tableau_opts=default_tableau_opts | {'memoization': memoization})
+                        for memoization in [False, True]
+                    ]
+                    self.assertEqual(results[0], results[1])
+
+    def test_lemma_cache(self):
+        parser = STLParser()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'lemmas.db')
+            for formula, expected in [
+                ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)", False),
+                ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)", False),
+                ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a) && G[0,10] b", False),
+                ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,2] !a)", True),
+            ]:
+                with self.subTest(formula=formula):
+                    res = make_tableau(parser.parse_formula_as_node(formula), 200, 'sat', False, False, False, False, lemma_cache=path)
+                    self.assertEqual(res, expected)
+
+            cache = LemmaCache(path, False)
+            store = TrieRejectedStore()
+            self.assertGreater(cache.load(store, parser.parse_formula_as_node("G[0,6] F[2,4] a")), 0)
+            self.assertEqual(cache.load(TrieRejectedStore(), parser.parse_formula_as_node("G[0,6] F[2,4] c")), 0)
+            self.assertEqual(cache.save(store), 0)
+            cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import contextlib
+import copy
+import io
+import multiprocessing as mp
+import threading
+import time
+import types
+import unittest
+
+from stl_consistency.node import Node
+from stl_consistency.memo import TrieRejectedStore
+from stl_consistency.parallel import WorkPool, parallel_search, STOP_TIMEOUT
+from stl_consistency.parser import STLParser
+from stl_consistency.tableau import make_tableau
+
+def donate_and_accept(work_pool):
+    # Donates a task to the other worker, and finds an accepting branch once it has been taken
+    while not work_pool.wants_work():
+        time.sleep(0.01)
+    work_pool.donate('busy', 1)
+    while work_pool.queued.value > 0:
+        time.sleep(0.01)
+    return True
+
+def cooperative_explore(tableau_data, local_solver, node, depth, max_depth, work_pool):
+    if node == 'root':
+        return donate_and_accept(work_pool)
+    while not work_pool.is_cancelled():
+        time.sleep(0.01)
+    return None
+
+def stuck_explore(tableau_data, local_solver, node, depth, max_depth, work_pool):
+    if node == 'root':
+        return donate_and_accept(work_pool)
+    # E.g. a long call to the SMT solver, which does not poll the cancellation token
+    time.sleep(60)
+    return False
+
+class TestParallel(unittest.TestCase):
+
+    def test_work_pool_accounting(self):
+        work_pool = WorkPool(2)
+        work_pool.donate('root', 0)
+        # The root task is not a donation to an idle worker
+        self.assertFalse(work_pool.wants_work())
+        self.assertEqual(work_pool.get_task(), ('root', 0))
+        self.assertEqual((work_pool.idle.value, work_pool.queued.value, work_pool.pending.value), (0, 0, 1))
+
+        # The second worker becomes idle
+        tasks = []
+        waiting = threading.Thread(target=lambda: tasks.append(work_pool.get_task()))
+        waiting.start()
+        while not work_pool.wants_work():
+            pass
+        work_pool.donate('child', 1)
+        # No other donation is wanted until the idle worker takes it
+        self.assertFalse(work_pool.wants_work())
+        waiting.join()
+        self.assertEqual(tasks, [('child', 1)])
+        self.assertEqual((work_pool.idle.value, work_pool.queued.value, work_pool.pending.value), (0, 0, 2))
+
+    def worker_view(self, work_pool, worker_id):
+        # The state of a worker process, sharing the queues of work_pool
+        view = copy.copy(work_pool)
+        view.worker_id = worker_id
+        view.outbox = []
+        view.sync_countdown = 1
+        return view
+
+    def test_shared_rejections(self):
+        work_pool = WorkPool(2)
+        worker0 = self.worker_view(work_pool, 0)
+        worker1 = self.worker_view(work_pool, 1)
+        rejected = Node(',', ['G', '0', '10', ['B_a']], ['F', '2', '5', ['B_b']])
+        rejected.current_time = 0
+        rejected.sort_operands()
+        worker0.publish_rejected(rejected)
+        self.assertEqual(worker1.exchange_rejected(), [])
+        worker0.flush_rejected()
+        received = []
+        while not received:
+            # Queues are fed by a background thread
+            worker1.sync_countdown = 1
+            received = worker1.exchange_rejected()
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0].operands, rejected.operands)
+        self.assertEqual(received[0].current_time, 0)
+        # Workers do not receive their own rejected nodes
+        worker0.sync_countdown = 1
+        self.assertEqual(worker0.exchange_rejected(), [])
+
+        # The received node prunes the nodes of worker 1 that imply it, and only them
+        store = TrieRejectedStore()
+        store.add(received[0])
+        stronger = Node(',', ['G', '0', '12', ['B_a']], ['F', '3', '4', ['B_b']], ['B_c'])
+        stronger.current_time = 0
+        stronger.sort_operands()
+        self.assertIsNotNone(store.find_implied(stronger))
+        weaker = Node(',', ['G', '0', '12', ['B_a']], ['F', '1', '4', ['B_b']])
+        weaker.current_time = 0
+        weaker.sort_operands()
+        self.assertIsNone(store.find_implied(weaker))
+
+    def test_cancellation(self):
+        # When a worker finds an accepting branch, the others stop at once if they poll the cancellation token,
+        # and are terminated after STOP_TIMEOUT otherwise
+        for explore, max_time in [(cooperative_explore, STOP_TIMEOUT), (stuck_explore, STOP_TIMEOUT + 2)]:
+            with self.subTest(explore=explore.__name__):
+                tableau_data = types.SimpleNamespace(deadline=None, verbose=False, expanded_nodes=0)
+                start_t = time.perf_counter()
+                self.assertTrue(parallel_search(explore, tableau_data, 'root', 100, 2))
+                self.assertLess(time.perf_counter() - start_t, max_time)
+                self.assertEqual(mp.active_children(), [])
+
+    def test_donations(self):
+        # Formulas with wide branching, so that the busy worker donates to the idle one
+        parser = STLParser()
+        formulas = [
+            "G[0,30] ((a && F[1,4] b) || (b && F[1,4] c) || (c && F[1,4] a)) && G[0,30] (a -> G[1,2] !a) && F[25,30] (a && b)",
+            "G[0,20] (a || b || c || d) && G[0,20] (a -> F[2,4] !a) && G[0,20] (b -> F[1,3] c) && G[5,20] !a && G[10,20] !d && G[0,20] (c -> !b) && F[15,20] (b && c)",
+            "G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a) && G[0,6] (b || c || d)",
+        ]
+        donations = 0
+        for formula in formulas:
+            for mode in ['sat', 'strong_sat']:
+                with self.subTest(formula=formula, mode=mode):
+                    expected = make_tableau(parser.parse_formula_as_node(formula), 1000, mode, False, False, False, False)
+                    output = io.StringIO()
+                    with contextlib.redirect_stdout(output):
+                        res = make_tableau(parser.parse_formula_as_node(formula), 1000, mode, False, False, 2, True)
+                    self.assertEqual(res, expected)
+                    donated = [line for line in output.getvalue().splitlines() if line.startswith('Donated ')]
+                    donations += int(donated[0].split()[1])
+        self.assertGreater(donations, 0)
+
+if __name__ == '__main__':
+    unittest.main()
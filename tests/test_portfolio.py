@@ -0,0 +1,83 @@
+# MIT License
+#
+# Copyright (c) 2024 Ezio Bartocci, Michele Chiari, Beatrice Melani
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import unittest
+import time
+
+from stl_consistency.portfolio import portfolio_check, tableau_portfolio_check, race
+from stl_consistency.parser import STLParser
+
+def crashing_engine(delay):
+    time.sleep(delay)
+    os._exit(1)
+
+def sleeping_engine(delay, res):
+    time.sleep(delay)
+    return res
+
+class TestPortfolio(unittest.TestCase):
+
+    def make_test(self, formula, expected, mltl=False):
+        parser = STLParser()
+        parsed_formula = parser.parse_formula_as_stl_list(formula)
+        res = portfolio_check(parsed_formula, 200, 'sat', mltl)
+        self.assertEqual(res, expected)
+
+    def test_engines(self):
+        self.make_test("G[0,10] !a && F[5,20] a && G[15,25] !a", True)
+        self.make_test("G[0,5] (|x| > 20 | |x| < 10) && F[0,5] (x == -15)", False)
+
+    def test_mltl(self):
+        formula = "F[58,92] ((a1) U[87,100] ((a1 && a0 && ! a1) U[9,100] (a0)))"
+        self.make_test(formula, False)
+        self.make_test(formula, True, mltl=True)
+
+    def test_tableau_configurations(self):
+        parser = STLParser()
+        parsed_formula = parser.parse_formula_as_stl_list("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)")
+        self.assertEqual(tableau_portfolio_check(parsed_formula, 200, 'sat', num_configurations=3), False)
+        configurations = [{'memoization': False}, {'jump': False, 'g_f': False}]
+        self.assertEqual(tableau_portfolio_check(parsed_formula, 200, 'sat', configurations=configurations), False)
+        with self.assertRaises(ValueError):
+            tableau_portfolio_check(parsed_formula, 200, 'sat', configurations=[{'jmp': False}])
+
+    def test_timeout(self):
+        parser = STLParser()
+        parsed_formula = parser.parse_formula_as_stl_list("G[0,3000] (a -> F[1,50] b) && G[0,3000] (b -> G[1,40] !a) && G[0,3000] (F[0,30] a) && G[0,3000] (c U[1,20] (a || x > 3))")
+        start_t = time.perf_counter()
+        self.assertIsNone(portfolio_check(parsed_formula, 10000000, 'sat', timeout=0.5))
+        self.assertIsNone(tableau_portfolio_check(parsed_formula, 10000000, 'sat', num_configurations=2, timeout=0.5))
+        self.assertLess(time.perf_counter() - start_t, 6)
+
+    def test_dead_engines(self):
+        # Engines whose process dies count as failed, instead of being waited for forever
+        start_t = time.perf_counter()
+        self.assertEqual(race([('crash', crashing_engine, (0,)), ('slow', sleeping_engine, (0.5, False))]), (False, 'slow'))
+        self.assertEqual(race([('crash', crashing_engine, (0,)), ('unknown', sleeping_engine, (0, None))]), (None, None))
+        with self.assertRaises(RuntimeError):
+            race([('crash1', crashing_engine, (0,)), ('crash2', crashing_engine, (0.2,))])
+        self.assertLess(time.perf_counter() - start_t, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,8 +21,11 @@
 # SOFTWARE.
 
 import unittest
+import threading
+import time
 
 from stl_consistency.smtchecker import smt_check_consistency
+from stl_consistency.deadline import Deadline
 from stl_consistency.parser import STLParser
 
 class TestSMTChecker(unittest.TestCase):
@@ -66,5 +69,21 @@ class TestSMTChecker(unittest.TestCase):
     def test_abs(self):
         self.make_test("G[0,5] (|x| > 20 | |x| < 10) && F[0,5] (x == -15)", False)
 
+    def test_deadline(self):
+        parser = STLParser()
+        parsed_formula = parser.parse_formula_as_stl_list("G[0,2000] (a -> F[1,50] b) && G[0,2000] (b -> G[1,40] !a) && G[0,2000] (F[0,30] a)")
+        deadline = Deadline(0.5)
+        start_t = time.perf_counter()
+        self.assertIsNone(smt_check_consistency(parsed_formula, 'sat', False, deadline=deadline))
+        self.assertLess(time.perf_counter() - start_t, 3)
+        self.assertIn('smt_variables', deadline.statistics)
+
+        # Cancellation from another thread
+        deadline = Deadline()
+        timer = threading.Timer(0.5, deadline.cancel)
+        timer.start()
+        self.assertIsNone(smt_check_consistency(parsed_formula, 'sat', False, deadline=deadline))
+        timer.join()
+
 if __name__ == '__main__':
     unittest.main()
@@ -21,9 +21,19 @@
 # SOFTWARE.
 
 import unittest
+import os
+import json
+import tempfile
+import threading
+import time
 
 from stl_consistency.node import Node
-from stl_consistency.tableau import make_tableau, shift_bounds
+from stl_consistency.tableau import make_tableau, resume_tableau, shift_bounds, next_time_instant, default_tableau_opts, assign_identifier, local_consistency_check, local_conflict, conflict_core, time_normalized_state, stutter_jump, TableauFrame
+from stl_consistency.local_solver import LocalSolver
+from stl_consistency.checkpoint import load_checkpoint
+from stl_consistency.deadline import Deadline
+from stl_consistency.trace import extend_trace, trace_segments, expand_trace, format_trace
+from stl_consistency.tree_recorder import TreeRecorder
 from stl_consistency.parser import STLParser
 
 class TestTableau(unittest.TestCase):
@@ -91,6 +101,277 @@ class TestTableau(unittest.TestCase):
     def test_U_parent(self):
         self.make_test("(G[0,89] F[88,100] a2 U[0,78] !a1) && a1", 500, True, mltl=True)
 
+    def test_deep_tableau(self):
+        # Without the jump rule the tableau has a branch with several nodes per time instant,
+        # which is deeper than Python's default recursion limit
+        parser = STLParser()
+        parsed_formula = parser.parse_formula_as_node("G[0,300] (a && F[0,3] b)")
+        res = make_tableau(parsed_formula, 100000, 'sat', False, False, False, False, tableau_opts=default_tableau_opts | {'jump': False})
+        self.assertEqual(res, True)
+
+    def test_schedulers(self):
+        parser = STLParser()
+        tests = [
+            ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)", False),
+            ("G[0,10] !a && F[5,20] a && G[15,25] !a", True),
+            ("b U[0,10] !a && G[0,9] a && F[10,20] a && G[15,20] !a", True),
+            ("G[0,5] (|x| > 20 | |x| < 10) && F[0,5] (x == -15)", False),
+        ]
+        for scheduler in ['best-first', 'beam']:
+            for formula, expected in tests:
+                with self.subTest(scheduler=scheduler, formula=formula):
+                    parsed_formula = parser.parse_formula_as_node(formula)
+                    res = make_tableau(parsed_formula, 200, 'sat', False, False, False, False, scheduler=scheduler)
+                    self.assertEqual(res, expected)
+
+    def test_parallel(self):
+        parser = STLParser()
+        tests = [
+            ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)", False),
+            ("F[0,10] !a && G[0,9] a && F[10,20] a && G[15,20] !a", True),
+            ("G[0,5] (|x| > 20 | |x| < 10) && F[0,5] (x == -15)", False),
+        ]
+        for formula, expected in tests:
+            with self.subTest(formula=formula):
+                parsed_formula = parser.parse_formula_as_node(formula)
+                res = make_tableau(parsed_formula, 200, 'sat', False, False, 2, False)
+                self.assertEqual(res, expected)
+
+    def test_unsat_core(self):
+        parser = STLParser()
+        tests = [
+            ("b && x > 5 && y > 0 && x < 3 && G[0,5] (y > 0) && G[0,5] (b && |x - z| > 2)", ['x < 3', 'x > 5'], {'x'}, 3),
+            ("b && a && !b && G[0,5] (a) && F[0,5] (b || c)", ['b', 'b'], {'b'}, 3),
+            ("a && x + y > 1 && x < 0 && y < 0 && F[0,5] (y > 0)", ['x + y > 1', 'x < 0', 'y < 0'], {'x', 'y'}, 4),
+        ]
+        for formula, core, reason, core_size in tests:
+            with self.subTest(formula=formula):
+                node = parser.parse_formula_as_node(formula)
+                assign_identifier(node)
+                node.operator = ','
+                local_solver = LocalSolver()
+                local_solver.push()
+                self.assertFalse(local_consistency_check(local_solver, node))
+                self.assertEqual(sorted(str(literal) for _, literal in local_solver.unsat_core()), sorted(core))
+                self.assertEqual(local_conflict(local_solver, node), reason)
+                self.assertEqual(len(conflict_core(node, reason).operands), core_size)
+
+    def test_conflict_learning(self):
+        parser = STLParser()
+        tests = [
+            (" && ".join(f"(a{i} || b{i})" for i in range(8)) + " && G[0,20] (c && x > 0) && F[5,20] (!c || x < 0)", False),
+            (" && ".join(f"F[0,10] (a{i} || b{i})" for i in range(5)) + " && G[0,20] (x > 2) && F[3,20] (x < 1)", False),
+            ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)", False),
+            ("(a || b) && G[0,10] (!a || c) && F[0,5] (x > 0 && !c) && G[2,8] (x < 0 || b)", True),
+            ("G[0,5] (|x| > 20 | |x| < 10) && F[0,5] (x == -15)", False),
+        ]
+        for mode in ['sat', 'complete']:
+            for formula, expected in tests:
+                for conflict_learning in [True, False]:
+                    with self.subTest(mode=mode, formula=formula, conflict_learning=conflict_learning):
+                        parsed_formula = parser.parse_formula_as_node(formula)
+                        res = make_tableau(parsed_formula, 1000, mode, False, False, False, False, tableau_opts=default_tableau_opts | {'conflict_learning': conflict_learning})
+                        self.assertEqual(res, expected)
+
+    def test_stutter_jump(self):
+        parser = STLParser()
+        tests = [
+            ("G[0,{T}] F[0,5] a", True),
+            ("G[0,{T}] (a -> G[1,3] !a) && G[0,{T}] F[0,4] a", True),
+            ("G[0,{T}] (a -> G[1,5] !a) && G[0,{T}] F[0,4] a", False),
+            ("G[0,{T}] (F[0,3] a && F[0,3] !a) && G[0,{T}] (a -> G[1,2] b)", True),
+            ("G[0,{T}] (a U[1,4] b) && G[0,{T}] (b -> F[1,3] !b)", True),
+            ("G[0,{T}] F[0,4] a && G[0,{T}] (a -> G[1,3] !a) && G[{T3},{T}] !a", True),
+            ("G[0,{T}] F[0,4] a && G[0,{T}] (a -> G[1,3] !a) && G[{T6},{T}] !a", False),
+            ("G[0,{T}] F[0,5] a && F[{T3},{T}] (b && !a)", True),
+        ]
+        for formula, expected in tests:
+            for horizon, stutter_jump in [(60, False), (60, True), (2000, True)]:
+                with self.subTest(formula=formula, horizon=horizon, stutter_jump=stutter_jump):
+                    parsed_formula = parser.parse_formula_as_node(formula.format(T=horizon, T3=horizon - 3, T6=horizon - 6))
+                    res = make_tableau(parsed_formula, 100000, 'sat', False, False, False, False, mltl=True, tableau_opts=default_tableau_opts | {'stutter_jump': stutter_jump})
+                    self.assertEqual(res, expected)
+
+    def test_time_normalized_state(self):
+        # Far bounds are part of the key together with their operands
+        node1 = Node(',', ['G', '0', '100', ['B_a']], ['G', '0', '200', ['B_b']])
+        node2 = Node(',', ['G', '0', '200', ['B_a']], ['G', '0', '100', ['B_b']])
+        node3 = Node(',', ['G', '5', '105', ['B_a']], ['G', '5', '205', ['B_b']])
+        node1.current_time = node2.current_time = 0
+        node3.current_time = 5
+        key1, _, far1, _ = time_normalized_state(node1)
+        key2, _, far2, _ = time_normalized_state(node2)
+        self.assertEqual(sorted(far1), sorted(far2))
+        self.assertNotEqual(key1, key2)
+        self.assertNotEqual(key1, time_normalized_state(node3)[0])
+        self.assertEqual(key1, time_normalized_state(node1.shallow_copy())[0])
+
+    def test_stutter_jump_far_bounds(self):
+        # Two states differing only in which operand has which far bound are not a period of the branch
+        first = Node(',', ['G', '0', '100', ['B_a']], ['G', '0', '200', ['B_b']])
+        first.current_time = 0
+        state = time_normalized_state(first)
+        branch_states = {state[0]: [TableauFrame(first, None, 0, None, [])]}
+        swapped = Node(',', ['G', '3', '200', ['B_a']], ['G', '3', '100', ['B_b']])
+        swapped.current_time = 3
+        self.assertIs(stutter_jump(swapped, time_normalized_state(swapped), branch_states), swapped)
+        same = Node(',', ['G', '3', '100', ['B_a']], ['G', '3', '200', ['B_b']])
+        same.current_time = 3
+        jumped = stutter_jump(same, time_normalized_state(same), branch_states)
+        self.assertGreater(jumped.current_time, 3)
+        self.assertEqual(sorted(op.upper for op in jumped.operands), [100, 200])
+
+    def test_checkpoint(self):
+        parser = STLParser()
+        tests = [
+            ("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)", False),
+            ("G[0,10] !a && F[5,20] a && G[15,25] !a", True),
+            ("G[0,5] (|x| > 20 | |x| < 10) && F[0,5] (x == -15)", False),
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'checkpoint')
+            for mode in ['sat', 'strong_sat', 'complete']:
+                for formula, expected in tests:
+                    with self.subTest(mode=mode, formula=formula):
+                        res = make_tableau(parser.parse_formula_as_node(formula), 1000, mode, False, False, False, False)
+                        self.assertEqual(res, expected)
+                        if os.path.exists(path):
+                            os.remove(path)
+                        res = make_tableau(parser.parse_formula_as_node(formula), 3, mode, False, False, False, False, checkpoint=path)
+                        self.assertIsNone(res)
+                        self.assertTrue(os.path.exists(path))
+                        self.assertGreater(len(load_checkpoint(path).frontier), 0)
+                        res = resume_tableau(path, 6, save_checkpoint_to=path)
+                        if res is None:
+                            self.assertGreater(len(load_checkpoint(path).frontier), 0)
+                            res = resume_tableau(path, 1000)
+                        self.assertEqual(res, expected)
+
+            # Checkpoint saved periodically during a search that completes, with traces
+            formula = "G[0,30] (a -> F[1,5] b) && G[0,30] (b -> G[1,4] !a) && F[10,20] a"
+            os.remove(path)
+            _, _, res = make_tableau(parser.parse_formula_as_node(formula), 1000, 'sat', False, True, False, False, checkpoint=path, checkpoint_interval=0.001)
+            self.assertTrue(res)
+            self.assertTrue(os.path.exists(path))
+            _, trace, res = resume_tableau(path, 1000)
+            self.assertTrue(res)
+            self.assertGreater(len(trace), 0)
+
+    def test_deadline(self):
+        parser = STLParser()
+        formula = "G[0,3000] (a -> F[1,50] b) && G[0,3000] (b -> G[1,40] !a) && G[0,3000] (F[0,30] a) && G[0,3000] (c U[1,20] (a || x > 3))"
+        for scheduler, parallel in [('dfs', False), ('best-first', False), ('dfs', 2)]:
+            with self.subTest(scheduler=scheduler, parallel=parallel):
+                deadline = Deadline(0.2)
+                start_t = time.perf_counter()
+                res = make_tableau(parser.parse_formula_as_node(formula), 10000000, 'sat', False, False, parallel, False, scheduler=scheduler, deadline=deadline)
+                self.assertIsNone(res)
+                self.assertLess(time.perf_counter() - start_t, 2)
+                self.assertGreater(deadline.statistics['expanded_nodes'], 0)
+
+        # Cancellation from another thread
+        deadline = Deadline()
+        timer = threading.Timer(0.2, deadline.cancel)
+        timer.start()
+        start_t = time.perf_counter()
+        res = make_tableau(parser.parse_formula_as_node(formula), 10000000, 'sat', False, False, False, False, deadline=deadline)
+        timer.join()
+        self.assertIsNone(res)
+        self.assertLess(time.perf_counter() - start_t, 2)
+
+        # The search interrupted by the deadline is saved to the checkpoint
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'checkpoint')
+            for formula, expected in [("G[0,6] F[2,4] a && G[0,6] (a -> G[1,3] !a)", False), ("G[0,10] !a && F[5,20] a && G[15,25] !a", True)]:
+                with self.subTest(formula=formula):
+                    res = make_tableau(parser.parse_formula_as_node(formula), 1000, 'sat', False, False, False, False, checkpoint=path, deadline=Deadline(0))
+                    self.assertIsNone(res)
+                    self.assertGreater(len(load_checkpoint(path).frontier), 0)
+                    self.assertIsNone(resume_tableau(path, 1000, deadline=Deadline(0)))
+                    self.assertEqual(resume_tableau(path, 1000), expected)
+
+    def test_trace(self):
+        parser = STLParser()
+        _, trace, res = make_tableau(parser.parse_formula_as_node("G[0,10] !a && F[5,20] a && G[15,25] !a"), 200, 'sat', False, True, False, False)
+        self.assertTrue(res)
+        instants = expand_trace(trace)
+        self.assertEqual(len(instants), 26)
+        self.assertTrue(all('! a' in instants[t] for t in list(range(0, 11)) + list(range(15, 26))))
+        self.assertTrue(any('a' in instants[t] for t in range(5, 21)))
+
+        # The trace has a segment per jump of the tableau, not per time instant
+        _, trace, res = make_tableau(parser.parse_formula_as_node("G[0,10000] (b && F[0,500] a)"), 100000, 'sat', False, True, False, False)
+        self.assertTrue(res)
+        self.assertLess(len(trace), 10)
+        self.assertEqual(trace[-1][1], 10001)
+
+        # Branches rejected before the accepting one do not leave segments in the trace
+        formula = parser.parse_formula_as_node("F[0,5] (a && G[1,3] b) && G[0,6] (b -> ! c) && G[2,4] c")
+        _, trace, res = make_tableau(formula, 1000, 'sat', False, True, False, False)
+        self.assertTrue(res)
+        self.assertTrue(all(prev[1] <= seg[0] for prev, seg in zip(trace, trace[1:])))
+        instants = expand_trace(trace)
+        self.assertTrue(all('c' in instants[t] and 'b' not in instants[t] for t in range(2, 5)))
+        self.assertTrue(any('a' in instants[t] and all('b' in instants[t + k] for k in range(1, 4)) for t in range(0, 6)))
+
+        prefix = extend_trace(extend_trace(None, 0, 3, ['b', 'a']), 3, 4, ['a', 'b'])
+        trace = trace_segments(extend_trace(prefix, 5, 6, ['a', 'b']))
+        self.assertEqual(trace, [(0, 4, ('a', 'b')), (5, 6, ('a', 'b'))])
+        self.assertEqual(trace_segments(extend_trace(prefix, 4, 5, ['c'])), [(0, 4, ('a', 'b')), (4, 5, ('c',))])
+        self.assertEqual(expand_trace(trace), [['a', 'b']] * 4 + [[], ['a', 'b']])
+        self.assertEqual(format_trace(trace), '[0, 3]: a, b\n5: a, b')
+
+    def test_tree_recorder(self):
+        parser = STLParser()
+        formula = "F[0,5] (a && G[1,3] b) && G[0,6] (b -> ! c) && G[2,4] c"
+        tree, _, res = make_tableau(parser.parse_formula_as_node(formula), 1000, 'sat', True, False, False, False)
+        self.assertTrue(res)
+        G = tree.to_networkx()
+        self.assertEqual(G.number_of_nodes(), len(tree.parents))
+        self.assertEqual(G.number_of_edges(), len(tree.parents) - 1)
+        self.assertEqual(G.nodes[tree.node_labels[0]]['status'], 'accepted')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def stream(**kwargs):
+                path = os.path.join(tmpdir, 'tree.jsonl')
+                with TreeRecorder(path, **kwargs) as recorder:
+                    make_tableau(parser.parse_formula_as_node(formula), 1000, 'sat', recorder, False, False, False)
+                with open(path) as f:
+                    records = [json.loads(line) for line in f]
+                return recorder, {r['id']: r for r in records if 'parent' in r}, {r['id']: r['status'] for r in records if 'status' in r}
+
+            recorder, nodes, statuses = stream()
+            self.assertEqual(len(nodes), len(tree.parents))
+            self.assertEqual(statuses[0], 'accepted')
+            self.assertIn('rejected', statuses.values())
+            self.assertTrue(all(r['parent'] is None or r['parent'] in nodes for r in nodes.values()))
+
+            recorder, nodes, _ = stream(max_depth=2, labels=False)
+            self.assertTrue(all(recorder.depths[i] <= 2 for i in nodes))
+            self.assertEqual(len(nodes), sum(d <= 2 for d in recorder.depths))
+            self.assertTrue(all('label' not in r for r in nodes.values()))
+
+            subtree = max(recorder.parents)
+            recorder, nodes, _ = stream(subtree=subtree)
+            self.assertIsNone(nodes[subtree]['parent'])
+            self.assertTrue(all(r['parent'] in nodes for i, r in nodes.items() if i != subtree))
+            self.assertGreater(len(nodes), 1)
+            self.assertLess(len(nodes), len(recorder.parents))
+
+            recorder, nodes, _ = stream(sample=0.5, seed=1)
+            self.assertIn(0, nodes)
+            self.assertTrue(all(r['parent'] is None or r['parent'] in nodes for r in nodes.values()))
+            self.assertLess(len(nodes), len(recorder.parents))
+
+    def test_next_time_instant(self):
+        node = Node(',', ['G', '3', '50', ['B_a']], ['F', '5', '20', ['B_b']], ['O', ['G', '0', '8', ['B_c']]])
+        node.current_time = 0
+        self.assertEqual(next_time_instant(node, False), 3)
+        node.current_time = 5
+        self.assertEqual(next_time_instant(node, False), 8)
+        node.current_time = 50
+        self.assertEqual(next_time_instant(node, False), None)
+
     def test_shift_bounds_GF(self):
         formula = [
             ',',